@@ -0,0 +1,55 @@
+"""Write synthetic recorded conversations for `python -m chatbot.replay run`.
+
+Every conversation opens with a visitor introduction and a question, goes on
+with follow-ups and FAQ questions (some of which the intent router answers
+itself), and a share of them leave an email address. Each turn carries a
+recorded assistant reply, like `python -m chatbot.replay export` writes.
+
+    python bench/conversations.py --conversations 2000 > /tmp/conversations.jsonl
+    python -m chatbot.replay run /tmp/conversations.jsonl --out /tmp/before.jsonl --workers 64
+"""
+import argparse
+import json
+import random
+import sys
+
+NAMES = ["Alex", "Priya", "Sam", "Mei", "Jordan", "Arjun", "Lena", "Omar", "Chris", "Ana"]
+COMPANIES = ["a fintech startup", "a logistics company", "a security vendor", "a cloud provider", "a hospital group"]
+QUESTIONS = [
+    "What do you do at Quantum?",
+    "How big is the team you manage?",
+    "What is the Unified Surveillance Platform?",
+    "What technologies do you work with?",
+    "Tell me about EnCloudEn",
+]
+FOLLOW_UPS = [
+    "Can you tell me more about that?",
+    "What was the hardest part?",
+    "How did the team grow over time?",
+    "What would you do differently?",
+    "Where did you study?",
+    "What are your main skills?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=4, help="turns per conversation (at most)")
+    parser.add_argument("--email-rate", type=float, default=0.2, help="share of conversations that leave an email")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for i in range(args.conversations):
+        messages = [f"Hi, I'm {rng.choice(NAMES)} from {rng.choice(COMPANIES)}. {rng.choice(QUESTIONS)}"]
+        messages += [rng.choice(FOLLOW_UPS + QUESTIONS) for _ in range(rng.randint(0, args.turns - 1))]
+        if rng.random() < args.email_rate:
+            messages[-1] = f"Sounds great, reach me at visitor{i}@example.com"
+        turns = [{"user": message, "assistant": f"Recorded answer {n} of conversation {i}."}
+                 for n, message in enumerate(messages)]
+        sys.stdout.write(json.dumps({"id": f"c{i:05d}", "turns": turns}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
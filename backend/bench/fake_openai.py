@@ -0,0 +1,183 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Lets the backend be load tested without an API key or network. Behaviour
+is controlled with environment variables:
+
+    FAKE_OPENAI_LATENCY          seconds before the response (or first token) is sent
+    FAKE_OPENAI_PREFILL_PER_1K   extra seconds per 1000 prompt tokens, to model prefill cost
+    FAKE_OPENAI_TOKEN_DELAY      seconds between streamed tokens
+    FAKE_OPENAI_TOOL_RATE        probability that a first round asks for record_unknown_question
+    FAKE_OPENAI_TOOL_TEXT_RATE   probability that a tool call comes with the reply text in the same response
+    FAKE_OPENAI_REPLY            assistant reply text
+    FAKE_OPENAI_FAIL_RATE        probability of answering 500, to exercise retries and the circuit breaker
+    FAKE_OPENAI_SLOW_RATE        probability of a latency spike, to exercise hedged requests
+    FAKE_OPENAI_SLOW_LATENCY     seconds added by a latency spike
+    FAKE_OPENAI_DEGRADED_MODEL   model name that always fails (e.g. the primary, to exercise fallback)
+    FAKE_OPENAI_PREFIX_CACHE     1 to emulate OpenAI prompt caching: prompt prefixes seen before (from 1024
+                                 tokens, in 128-token steps) are reported as cached_tokens and skip prefill cost
+
+A user message containing an email address always triggers a
+record_user_details tool call, so lead-capture turns can be exercised too.
+
+Run it and point the backend at it:
+    uvicorn bench.fake_openai:app --port 9100
+    OPENAI_BASE_URL=http://localhost:9100/v1 OPENAI_API_KEY=test uvicorn fastapi_app:app
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_OPENAI_LATENCY", "1.0"))
+PREFILL_PER_1K = float(os.getenv("FAKE_OPENAI_PREFILL_PER_1K", "0.0"))
+TOKEN_DELAY = float(os.getenv("FAKE_OPENAI_TOKEN_DELAY", "0.02"))
+TOOL_RATE = float(os.getenv("FAKE_OPENAI_TOOL_RATE", "0.0"))
+TOOL_TEXT_RATE = float(os.getenv("FAKE_OPENAI_TOOL_TEXT_RATE", "0.0"))
+REPLY = os.getenv("FAKE_OPENAI_REPLY", "Thanks for asking! I lead the USP engineering team at Quantum.")
+FAIL_RATE = float(os.getenv("FAKE_OPENAI_FAIL_RATE", "0.0"))
+SLOW_RATE = float(os.getenv("FAKE_OPENAI_SLOW_RATE", "0.0"))
+SLOW_LATENCY = float(os.getenv("FAKE_OPENAI_SLOW_LATENCY", "10.0"))
+DEGRADED_MODEL = os.getenv("FAKE_OPENAI_DEGRADED_MODEL")
+PREFIX_CACHE = os.getenv("FAKE_OPENAI_PREFIX_CACHE", "").lower() in ("1", "true", "yes")
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+
+app = FastAPI(title="Fake OpenAI")
+stats = {"requests": 0, "streamed": 0, "tool_rounds": 0, "tool_rounds_with_text": 0, "prompt_tokens": 0, "cached_tokens": 0, "failed": 0,
+         "slow": 0, "models": {}}
+# Hashes of prompt prefixes seen so far, oldest first
+prefix_cache = OrderedDict()
+
+
+def cached_prefix_tokens(body):
+    """Tokens of the longest previously seen prompt prefix, on the same ~4 characters per token
+    estimate as prompt_tokens: caching starts at 1024 tokens and grows in 128-token steps"""
+    text = "".join(f"{message.get('role')}\n{message.get('content') or ''}\n" for message in body.get("messages", []))
+    digest = hashlib.sha256(text[:4096].encode())
+    cached = 0
+    for end in range(4096, len(text) + 1, 512):
+        if end > 4096:
+            digest.update(text[end - 512:end].encode())
+        key = digest.hexdigest()
+        if key in prefix_cache:
+            prefix_cache.move_to_end(key)
+            cached = end // 4
+        else:
+            prefix_cache[key] = True
+    while len(prefix_cache) > 100000:
+        prefix_cache.popitem(last=False)
+    return cached
+
+
+def plan_tool_call(messages):
+    """Decide whether this round answers with a tool call, mimicking the real bot's tools"""
+    last = messages[-1] if messages else {}
+    if last.get("role") != "user":
+        # Tool results came back (or summarization): answer with text
+        return None
+    content = last.get("content") or ""
+    email = EMAIL_RE.search(content)
+    if email:
+        return {"name": "record_user_details", "arguments": json.dumps({"email": email.group(0), "notes": content[:200]})}
+    if TOOL_RATE and random.random() < TOOL_RATE:
+        return {"name": "record_unknown_question", "arguments": json.dumps({"question": content[:200]})}
+    return None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "gpt-4o-mini")
+    # Rough token estimate: ~4 characters per token
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+    tool_call = plan_tool_call(messages) if body.get("tools") else None
+    # Models asked to do so often answer in the same response that calls a tool
+    with_text = not tool_call or (TOOL_TEXT_RATE and random.random() < TOOL_TEXT_RATE)
+    completion_tokens = len(REPLY) // 4 if with_text else 10
+
+    stats["requests"] += 1
+    stats["models"][model] = stats["models"].get(model, 0) + 1
+    if model == DEGRADED_MODEL or (FAIL_RATE and random.random() < FAIL_RATE):
+        stats["failed"] += 1
+        await asyncio.sleep(LATENCY / 10)
+        return JSONResponse(status_code=500, content={"error": {"message": "fake upstream failure", "type": "server_error"}})
+    cached_tokens = min(prompt_tokens, cached_prefix_tokens(body)) if PREFIX_CACHE else 0
+    stats["prompt_tokens"] += prompt_tokens
+    stats["cached_tokens"] += cached_tokens
+    if tool_call:
+        stats["tool_rounds"] += 1
+        stats["tool_rounds_with_text"] += bool(with_text)
+
+    delay = LATENCY + PREFILL_PER_1K * (prompt_tokens - cached_tokens) / 1000
+    if SLOW_RATE and random.random() < SLOW_RATE:
+        stats["slow"] += 1
+        delay += SLOW_LATENCY
+    await asyncio.sleep(delay)
+    created = int(time.time())
+    call_id = f"call_{random.getrandbits(48):x}"
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+             "total_tokens": prompt_tokens + completion_tokens,
+             "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+    if body.get("stream"):
+        stats["streamed"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def events():
+            base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model}
+
+            def frame(delta, finish_reason=None):
+                return f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]))}\n\n"
+
+            if with_text:
+                for i, word in enumerate(REPLY.split(" ")):
+                    yield frame({"content": word if i == 0 else f" {word}"})
+                    await asyncio.sleep(TOKEN_DELAY)
+            if tool_call:
+                yield frame({"role": "assistant", "tool_calls": [{"index": 0, "id": call_id, "type": "function",
+                                                                  "function": {"name": tool_call["name"], "arguments": ""}}]})
+                yield frame({"tool_calls": [{"index": 0, "function": {"arguments": tool_call["arguments"]}}]})
+                yield frame({}, "tool_calls")
+            else:
+                yield frame({}, "stop")
+            if include_usage:
+                yield f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    if tool_call:
+        message = {"role": "assistant", "content": REPLY if with_text else None, "tool_calls": [
+            {"id": call_id, "type": "function", "function": tool_call}
+        ]}
+        finish_reason = "tool_calls"
+    else:
+        message = {"role": "assistant", "content": REPLY}
+        finish_reason = "stop"
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": usage
+    }
+
+
+@app.get("/v1/models")
+async def list_models():
+    # Used by the backend's per-worker warmup
+    return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "created": 0, "owned_by": "fake"}]}
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
@@ -0,0 +1,41 @@
+"""Local stand-in for the Pushover messages API.
+
+Accepts notifications, optionally slowly or unreliably, and counts them:
+
+    FAKE_PUSHOVER_LATENCY     seconds before responding
+    FAKE_PUSHOVER_FAIL_RATE   probability of answering 500 instead of 200
+
+    uvicorn bench.fake_pushover:app --port 9200
+    PUSHOVER_API_URL=http://localhost:9200/1/messages.json PUSHOVER_TOKEN=t PUSHOVER_USER=u uvicorn fastapi_app:app
+"""
+import asyncio
+import os
+import random
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY = float(os.getenv("FAKE_PUSHOVER_LATENCY", "0.2"))
+FAIL_RATE = float(os.getenv("FAKE_PUSHOVER_FAIL_RATE", "0.0"))
+
+app = FastAPI(title="Fake Pushover")
+stats = {"received": 0, "failed": 0, "last_message": None}
+
+
+@app.post("/1/messages.json")
+async def messages(request: Request):
+    # Parsed by hand so the stub doesn't need python-multipart
+    form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+    await asyncio.sleep(LATENCY)
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        stats["failed"] += 1
+        return JSONResponse({"status": 0, "errors": ["simulated failure"]}, status_code=500)
+    stats["received"] += 1
+    stats["last_message"] = form.get("message")
+    return {"status": 1, "request": "fake"}
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
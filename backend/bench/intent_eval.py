@@ -0,0 +1,131 @@
+"""Evaluate the FAQ fast path on a labelled set of visitor questions.
+
+Reports how many questions the intent router answers itself (hit rate),
+whether it picked the right intent, how many questions it should have left
+to the model but didn't, and how long routing takes. No OpenAI calls are
+made; the profile is read from me/ (or the profile cache).
+
+    python bench/intent_eval.py
+    python bench/intent_eval.py --threshold 0.5 --show
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("PROFILE_WATCH_INTERVAL", "0")
+os.environ.setdefault("OPENAI_API_KEY", "not-needed")
+
+from chatbot import Me  # noqa: E402
+from chatbot.intents import IntentRouter  # noqa: E402
+
+# (question, intent the fast path should answer with, or None for "leave it to the model")
+LABELLED = [
+    ("Where did you study?", "education"),
+    ("What did you study?", "education"),
+    ("Which college did you attend?", "education"),
+    ("What's your educational background?", "education"),
+    ("How do I contact you?", "contact"),
+    ("How can I reach you?", "contact"),
+    ("What's your email?", "contact"),
+    ("What is your LinkedIn?", "contact"),
+    ("Where are you based?", "location"),
+    ("Where do you live?", "location"),
+    ("Where are you from?", "location"),
+    ("What's your current role?", "current_role"),
+    ("Where do you work?", "current_role"),
+    ("What is your job title?", "current_role"),
+    ("Which companies have you worked for?", "companies"),
+    ("Where have you worked before?", "companies"),
+    ("What do you do at Quantum?", "company"),
+    ("Tell me about EnCloudEn", "company"),
+    ("What was your role at Isomeds?", "company"),
+    ("How big is the team you manage?", None),
+    ("What is the Unified Surveillance Platform?", None),
+    ("What technologies do you work with?", None),
+    ("What do you do outside of work?", None),
+    ("Can you tell me more about that?", None),
+    ("What was the hardest part?", None),
+    ("Why did you leave EnCloudEn?", None),
+    ("Do you play chess?", None),
+    ("Are you open to new opportunities?", None),
+    ("How did the team grow over time?", None),
+    ("Why was Isomeds shut down?", None),
+    ("What is Quantum's stock price?", None),
+    ("How many people report to you at Quantum?", None),
+    ("What is your leadership style?", None),
+    ("Do you know Kubernetes?", None),
+    ("Sure, reach me at visitor@example.com", None),
+    ("hi", None),
+    # Share one keyword or question word with an intent but ask something else
+    ("What is your current salary?", None),
+    ("Do you have a job opening for me?", None),
+    ("Can you email me the job description?", None),
+    ("Where is Quantum located?", None),
+    ("Which city should I visit?", None),
+    ("Do you live in the US?", None),
+    # Written after min_coverage was chosen, as a check on the tuning
+    ("Can I get your email?", "contact"),
+    ("Which university did you go to?", "education"),
+    ("What was your previous employer?", "companies"),
+    ("How much do you earn?", None),
+    ("Do you like your current job?", None),
+    ("What's your favourite city?", None),
+    ("Where did you study machine learning?", None),
+    ("What is your role in hiring?", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("INTENT_THRESHOLD", "0.6")))
+    parser.add_argument("--min-coverage", type=float, default=float(os.getenv("INTENT_MIN_COVERAGE", "0.75")))
+    parser.add_argument("--rounds", type=int, default=200, help="timing repetitions per question")
+    parser.add_argument("--show", action="store_true", help="print every question with its score")
+    args = parser.parse_args()
+
+    snapshot = Me().profile.snapshot
+    router = IntentRouter(threshold=args.threshold, min_coverage=args.min_coverage)
+    facts = router.facts(snapshot)
+
+    hits = correct = wrong = missed = false_hits = 0
+    for question, expected in LABELLED:
+        intent, score, _, coverage = router.classify(question, facts)
+        routed = router.route(question, snapshot)
+        got = routed[0] if routed else None
+        hits += bool(routed)
+        if expected and got == expected:
+            correct += 1
+        elif expected and got:
+            wrong += 1
+        elif expected:
+            missed += 1
+        elif got:
+            false_hits += 1
+        if args.show:
+            mark = "ok " if got == expected else "BAD"
+            print(f"{mark} {score:5.2f} {coverage:5.2f} {intent['name'] if intent else '-':<13} -> {got or 'llm':<13} {question}")
+
+    timings = []
+    for _ in range(args.rounds):
+        for question, _ in LABELLED:
+            start = time.perf_counter()
+            router.route(question, snapshot)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    answerable = sum(1 for _, expected in LABELLED if expected)
+    print(f"threshold:      {args.threshold}  min coverage: {args.min_coverage}")
+    print(f"questions:      {len(LABELLED)} ({answerable} answerable from the profile)")
+    print(f"fast-path hits: {hits} ({hits / len(LABELLED):.0%} of all questions)")
+    print(f"correct intent: {correct}/{answerable}  wrong intent: {wrong}  missed: {missed}")
+    print(f"false hits:     {false_hits} of {len(LABELLED) - answerable} questions meant for the model")
+    print(f"routing ms:     p50 {statistics.median(timings) * 1000:.3f}  "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Load generator for the chat API.
+
+Simulates visitors holding multi-turn conversations against /chat or
+/chat/stream and reports latency percentiles, throughput and server memory.
+Works against the FastAPI backend (sessions) and the Flask api.py (full
+history per request). Pair it with bench/fake_openai.py and
+bench/fake_pushover.py to run without real API keys:
+
+    python bench/loadgen.py --url http://localhost:8000/chat --concurrency 50 --conversations 500 --turns 3
+    python bench/loadgen.py --url http://localhost:8000/chat/stream --stream --pid-tree $(pgrep -of gunicorn)
+    python bench/loadgen.py --url http://localhost:5000/chat --history   # Flask api.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+QUESTIONS = [
+    "What do you do at Quantum?",
+    "Tell me about EnCloudEn",
+    "What was your role at Isomeds?",
+    "Where did you study?",
+    "How big is the team you manage?",
+    "What is the Unified Surveillance Platform?",
+    "What technologies do you work with?",
+    "What do you do outside of work?",
+]
+FOLLOW_UPS = [
+    "Can you tell me more about that?",
+    "What was the hardest part?",
+    "How did the team grow over time?",
+    "What would you do differently?",
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree(root):
+    """root and all its descendants (Linux /proc)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Field 4 is the parent pid; the command name (field 2) may contain spaces
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.first_bytes = []
+        self.errors = Counter()
+        self.peak_rss = {}
+
+    def sample_memory(self, pids):
+        for pid in pids:
+            self.peak_rss[pid] = max(self.peak_rss.get(pid, 0), rss_bytes(pid))
+
+
+async def send_turn(client, args, message, state, results):
+    body = {"message": message}
+    if args.history:
+        body["history"] = state["history"]
+    else:
+        body["session_id"] = state.get("session_id")
+
+    start = time.perf_counter()
+    reply = []
+    try:
+        if args.stream:
+            async with client.stream("POST", args.url, json=body) as response:
+                response.raise_for_status()
+                event = "message"
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: "):
+                        payload = json.loads(line[6:])
+                        if event == "session":
+                            state["session_id"] = payload["session_id"]
+                        elif event == "error":
+                            raise RuntimeError(payload.get("error"))
+                        elif "delta" in payload:
+                            if not reply:
+                                results.first_bytes.append(time.perf_counter() - start)
+                            reply.append(payload["delta"])
+                    elif not line:
+                        event = "message"
+        else:
+            response = await client.post(args.url, json=body)
+            response.raise_for_status()
+            payload = response.json()
+            state["session_id"] = payload.get("session_id")
+            reply.append(payload.get("response") or "")
+    except Exception as e:
+        results.errors[type(e).__name__] += 1
+        return
+    results.latencies.append(time.perf_counter() - start)
+    state["history"] += [{"role": "user", "content": message}, {"role": "assistant", "content": "".join(reply)}]
+
+
+async def visitor(client, args, queue, results):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        state = {"history": []}
+        for turn in range(args.turns):
+            if turn == 0:
+                message = random.choice(QUESTIONS)
+            elif random.random() < args.email_rate:
+                message = f"Sure, reach me at visitor{random.randint(1, 10**6)}@example.com"
+            else:
+                message = random.choice(FOLLOW_UPS)
+            await send_turn(client, args, message, state, results)
+
+
+async def run(args):
+    pids = []
+    for root in args.pid_tree:
+        pids.extend(process_tree(root))
+    pids.extend(args.pid)
+
+    results = Results()
+    queue = asyncio.Queue()
+    for i in range(args.conversations):
+        queue.put_nowait(i)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        async def monitor():
+            while True:
+                results.sample_memory(pids)
+                await asyncio.sleep(0.5)
+
+        monitor_task = asyncio.create_task(monitor()) if pids else None
+        started = time.perf_counter()
+        await asyncio.gather(*(visitor(client, args, queue, results) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        if monitor_task:
+            monitor_task.cancel()
+            results.sample_memory(pids)
+
+    latencies = sorted(results.latencies)
+    first_bytes = sorted(results.first_bytes)
+    report = {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "conversations": args.conversations,
+        "turns": args.turns,
+        "requests": len(latencies) + sum(results.errors.values()),
+        "errors": dict(results.errors),
+        "elapsed_s": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "mean": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        },
+    }
+    if first_bytes:
+        report["first_token_ms"] = {
+            "p50": round(percentile(first_bytes, 0.50) * 1000, 1),
+            "p95": round(percentile(first_bytes, 0.95) * 1000, 1),
+            "p99": round(percentile(first_bytes, 0.99) * 1000, 1),
+        }
+    if pids:
+        report["peak_rss_mb"] = {str(pid): round(rss / 2**20, 1) for pid, rss in results.peak_rss.items() if rss}
+    return report
+
+
+def print_report(report):
+    print(f"target:       {report['url']}")
+    print(f"load:         {report['concurrency']} concurrent visitors, "
+          f"{report['conversations']} conversations x {report['turns']} turns")
+    print(f"requests:     {report['requests']} ({sum(report['errors'].values())} errors)")
+    for name, count in report["errors"].items():
+        print(f"  {name}: {count}")
+    print(f"elapsed:      {report['elapsed_s']}s")
+    print(f"throughput:   {report['rps']} req/s")
+    latency = report["latency_ms"]
+    print(f"latency ms:   p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  mean {latency['mean']}")
+    if "first_token_ms" in report:
+        first = report["first_token_ms"]
+        print(f"first token:  p50 {first['p50']}  p95 {first['p95']}  p99 {first['p99']}")
+    for pid, mb in report.get("peak_rss_mb", {}).items():
+        print(f"peak RSS:     pid {pid}: {mb} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/chat")
+    parser.add_argument("--concurrency", type=int, default=50, help="simultaneous visitors")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=1, help="messages per conversation")
+    parser.add_argument("--stream", action="store_true", help="consume the SSE endpoint and report time to first token")
+    parser.add_argument("--history", action="store_true", help="send the full history each turn (Flask api.py) instead of a session id")
+    parser.add_argument("--email-rate", type=float, default=0.0, help="chance a follow-up turn leaves an email address")
+    parser.add_argument("--pid", type=int, action="append", default=[], help="server process to sample RSS from")
+    parser.add_argument("--pid-tree", type=int, action="append", default=[], help="sample RSS of this process and its children")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure how much of each prompt the provider can serve from its prefix cache.
+
+Plays multi-turn conversations through Me.chat against bench/fake_openai.py
+with FAKE_OPENAI_PREFIX_CACHE=1 and reports, per turn of the conversation,
+the share of prompt tokens that came back as cached and the latency. Every
+conversation opens with a different visitor introduction, so identical
+prompts don't repeat across conversations the way they would with a fixed
+question list; only genuinely shared prefixes are cached.
+
+    FAKE_OPENAI_LATENCY=0.2 FAKE_OPENAI_PREFILL_PER_1K=0.3 FAKE_OPENAI_PREFIX_CACHE=1 \\
+        uvicorn bench.fake_openai:app --port 9100
+    OPENAI_BASE_URL=http://localhost:9100/v1 OPENAI_API_KEY=test python bench/prompt_cache.py
+    OPENAI_BASE_URL=http://localhost:9100/v1 OPENAI_API_KEY=test PROFILE_RETRIEVAL_TOP_K=0 python bench/prompt_cache.py
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("PROFILE_WATCH_INTERVAL", "0")
+# Every turn must reach the model
+os.environ.setdefault("INTENT_ROUTER", "0")
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+os.environ.setdefault("ANALYTICS", "0")
+
+from chatbot import Me  # noqa: E402
+
+NAMES = ["Alex", "Priya", "Sam", "Mei", "Jordan", "Arjun", "Lena", "Omar", "Chris", "Ana"]
+COMPANIES = ["a fintech startup", "a logistics company", "a security vendor", "a cloud provider", "a hospital group"]
+QUESTIONS = [
+    "What do you do at Quantum?",
+    "How big is the team you manage?",
+    "What is the Unified Surveillance Platform?",
+    "What technologies do you work with?",
+    "Tell me about EnCloudEn",
+]
+FOLLOW_UPS = [
+    "Can you tell me more about that?",
+    "What was the hardest part?",
+    "How did the team grow over time?",
+    "What would you do differently?",
+    "Which part of that are you most proud of?",
+]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stats_url = os.environ["OPENAI_BASE_URL"].rstrip("/").removesuffix("/v1") + "/stats"
+    me = Me()
+    per_turn = [{"prompt": 0, "cached": 0, "latencies": []} for _ in range(args.turns)]
+
+    async with httpx.AsyncClient() as client:
+        async def fake_stats():
+            stats = (await client.get(stats_url)).json()
+            return stats["prompt_tokens"], stats.get("cached_tokens", 0)
+
+        for i in range(args.conversations):
+            history = []
+            for turn in range(args.turns):
+                if turn == 0:
+                    message = f"Hi, I'm {rng.choice(NAMES)} from {rng.choice(COMPANIES)} (#{i}). {rng.choice(QUESTIONS)}"
+                else:
+                    message = rng.choice(FOLLOW_UPS)
+                before = await fake_stats()
+                start = time.perf_counter()
+                reply = await me.chat(message, history)
+                latency = time.perf_counter() - start
+                after = await fake_stats()
+                per_turn[turn]["prompt"] += after[0] - before[0]
+                per_turn[turn]["cached"] += after[1] - before[1]
+                per_turn[turn]["latencies"].append(latency)
+                history += [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+
+    print(f"retrieval top_k: {me.retrieval_top_k}")
+    print(f"{'turn':<6}{'prompt tokens':>15}{'cached':>10}{'p50 ms':>10}{'mean ms':>10}")
+    for turn, entry in enumerate(per_turn, 1):
+        share = entry["cached"] / entry["prompt"] if entry["prompt"] else 0.0
+        print(f"{turn:<6}{entry['prompt'] / args.conversations:>15.0f}{share:>10.1%}"
+              f"{statistics.median(entry['latencies']) * 1000:>10.0f}{statistics.mean(entry['latencies']) * 1000:>10.0f}")
+    await me.openai.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
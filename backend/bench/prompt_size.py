@@ -0,0 +1,67 @@
+"""Compare prompt size and chat latency for full-context vs retrieved prompts.
+
+Runs a fixed set of visitor questions through Me.chat twice, once with every
+profile document in the system prompt and once with BM25 retrieval, against
+whatever OPENAI_BASE_URL points to (e.g. bench/fake_openai.py with
+FAKE_OPENAI_PREFILL_PER_1K set to model prefill cost):
+
+    FAKE_OPENAI_LATENCY=0.3 FAKE_OPENAI_PREFILL_PER_1K=0.2 uvicorn bench.fake_openai:app --port 9100
+    OPENAI_BASE_URL=http://localhost:9100/v1 OPENAI_API_KEY=test python bench/prompt_size.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("PROFILE_WATCH_INTERVAL", "0")
+# Every question must reach the model for the comparison to mean anything
+os.environ.setdefault("INTENT_ROUTER", "0")
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+
+from chatbot import Me  # noqa: E402
+
+QUESTIONS = [
+    "What do you do at Quantum?",
+    "Tell me about EnCloudEn",
+    "What was your role at Isomeds?",
+    "Which programming languages have you worked with?",
+    "How big is the team you manage?",
+    "What is the Unified Surveillance Platform?",
+    "Have you worked on Kubernetes or cloud infrastructure?",
+    "What did you build with Flutter?",
+]
+
+
+async def measure(me, top_k, rounds):
+    me.retrieval_top_k = top_k
+    sizes = []
+    for question in QUESTIONS:
+        system_prompt, context, _ = me.system_prompt(question, [])
+        sizes.append(len(system_prompt) + len(context or ""))
+    latencies = []
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            await me.chat(question, [])
+            latencies.append(time.perf_counter() - start)
+    return sizes, latencies
+
+
+async def main():
+    rounds = int(os.getenv("ROUNDS", "2"))
+    me = Me()
+    top_k = me.retrieval_top_k or 4
+    print(f"{'mode':<16}{'prompt chars':>14}{'~tokens':>10}{'p50 ms':>10}{'mean ms':>10}")
+    for label, k in (("full context", 0), (f"retrieval k={top_k}", top_k)):
+        sizes, latencies = await measure(me, k, rounds)
+        mean_chars = statistics.mean(sizes)
+        print(f"{label:<16}{mean_chars:>14.0f}{mean_chars / 4:>10.0f}"
+              f"{statistics.median(latencies) * 1000:>10.0f}{statistics.mean(latencies) * 1000:>10.0f}")
+    await me.openai.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""Serialization and compression cost per chat request.
+
+Times the JSON work a request does outside the model call, before and after
+switching to orjson and the strict request schema: parsing the request body
+(session-only and legacy full-history clients), rendering the JSON response,
+encoding the SSE frames of a streamed answer, and re-encoding the assistant
+tool-call message between rounds. Also reports how much gzip and brotli
+shrink the response and the stream, and what that costs in CPU.
+
+    python bench/serialization.py
+    python bench/serialization.py --history-turns 40 --rounds 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "not-needed")
+
+import orjson  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from openai.types.chat import ChatCompletionMessage  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from chatbot.compression import BrotliEncoder, GzipEncoder, brotli  # noqa: E402
+from chatbot.engine import clean_history, tool_call_message  # noqa: E402
+from fastapi_app import ChatRequest  # noqa: E402
+
+ANSWER = (
+    "At Quantum I lead the Unified Surveillance Platform engineering team. We build the video management "
+    "software that ties cameras, recorders and analytics together for large deployments, and I look after "
+    "architecture, delivery and hiring across backend, frontend and QA. Before that I spent several years "
+    "at EnCloudEn working on private cloud infrastructure, and I started my career building products at "
+    "Isomeds. If you'd like to talk about a role or a project, leave your email and I'll get back to you. "
+) * 2
+
+
+class LegacyChatRequest(BaseModel):
+    """The request model before the strict schema: history was an untyped list"""
+    message: str
+    session_id: Optional[str] = None
+    history: list = []
+
+
+def bench(fn, rounds):
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-turns", type=int, default=20, help="items in a legacy client's history")
+    parser.add_argument("--deltas", type=int, default=200, help="streamed tokens per answer")
+    parser.add_argument("--rounds", type=int, default=5000)
+    args = parser.parse_args()
+
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant",
+         "content": "Tell me more about the platform team" if i % 2 == 0 else ANSWER[:600]}
+        for i in range(args.history_turns)
+    ]
+    session_body = json.dumps({"message": "What do you do at Quantum?", "session_id": "a" * 32}).encode()
+    legacy_body = json.dumps({"message": "What do you do at Quantum?", "history": history}).encode()
+    response = {"response": ANSWER, "session_id": "a" * 32}
+    words = ANSWER.split(" ")
+    deltas = [" " + words[i % len(words)] for i in range(args.deltas)]
+    message_obj = ChatCompletionMessage.model_validate({
+        "role": "assistant", "content": None,
+        "tool_calls": [{"id": "call_1", "type": "function",
+                        "function": {"name": "record_unknown_question", "arguments": '{"question": "Do you play chess?"}'}}],
+    })
+
+    rows = [
+        ("parse session request", "json + untyped model",
+         lambda: LegacyChatRequest.model_validate(json.loads(session_body)),
+         lambda: ChatRequest.model_validate(orjson.loads(session_body))),
+        (f"parse {args.history_turns}-turn history", "json + untyped + clean_history",
+         lambda: clean_history(LegacyChatRequest.model_validate(json.loads(legacy_body)).history),
+         lambda: ChatRequest.model_validate(orjson.loads(legacy_body)).history),
+        ("render response", "JSONResponse",
+         lambda: JSONResponse(response).body,
+         lambda: ORJSONResponse(response).body),
+        (f"encode {args.deltas} SSE frames", "json.dumps",
+         lambda: [f"data: {json.dumps({'delta': delta})}\n\n" for delta in deltas],
+         lambda: [f"data: {orjson.dumps({'delta': delta}).decode()}\n\n" for delta in deltas]),
+        ("tool-call message per round", "SDK model_dump + json",
+         lambda: json.dumps(message_obj.model_dump(exclude_unset=True)),
+         lambda: json.dumps(tool_call_message(message_obj.content, message_obj.tool_calls))),
+    ]
+    print(f"{'step':<30} {'before':<32} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for name, baseline, before, after in rows:
+        before_us, after_us = bench(before, args.rounds), bench(after, args.rounds)
+        print(f"{name:<30} {baseline:<32} {before_us:>10.1f} {after_us:>10.1f} {before_us / after_us:>7.1f}x")
+
+    body = ORJSONResponse(response).body
+    frames = [f"data: {orjson.dumps({'delta': delta}).decode()}\n\n".encode() for delta in deltas]
+    raw_stream = sum(len(frame) for frame in frames)
+    encoders = [("gzip", lambda: GzipEncoder(6))] + ([("br", lambda: BrotliEncoder(4))] if brotli else [])
+    print()
+    print(f"{'payload':<30} {'encoding':<10} {'raw bytes':>10} {'sent bytes':>10} {'cpu us':>10}")
+    for encoding, make in encoders:
+        sent = len(make().finish(body))
+        cpu = bench(lambda: make().finish(body), args.rounds // 5)
+        print(f"{'chat response':<30} {encoding:<10} {len(body):>10} {sent:>10} {cpu:>10.1f}")
+
+        def stream():
+            encoder = make()
+            return sum(len(encoder.chunk(frame)) for frame in frames) + len(encoder.finish())
+        cpu = bench(stream, args.rounds // 50)
+        print(f"{f'SSE stream ({args.deltas} frames)':<30} {encoding:<10} {raw_stream:>10} {stream():>10} {cpu:>10.1f}")
+    if not brotli:
+        print("(brotli not installed; only gzip measured)")
+    # What the stream would compress to if it didn't have to be readable event by event
+    print(f"{'SSE stream, not flushed':<30} {'gzip':<10} {raw_stream:>10} "
+          f"{len(zlib.compress(b''.join(frames), 6)):>10} {'':>10}")
+
+
+if __name__ == "__main__":
+    main()
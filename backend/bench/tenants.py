@@ -0,0 +1,149 @@
+"""Cold-load latency and memory per tenant when many profiles share one process.
+
+Creates `--tenants` tenant directories from the documents in me/ (each with
+its own name, summary and work experience, and a copy of the resume DOCX),
+then loads them through the tenant registry the way first requests would:
+
+- cold load: first request for a tenant, DOCX parsed (empty extraction cache)
+- warm-disk load: the same after a restart, text read from the extraction cache
+- resident hit: a request for a tenant that is already in memory
+- memory: Python heap per resident tenant (tracemalloc), and RSS growth
+  over the cold loads
+
+Nothing is sent to OpenAI; every tenant shares one client with the default profile.
+
+    python bench/tenants.py
+    python bench/tenants.py --tenants 200 --max-resident 50
+"""
+import argparse
+import asyncio
+import gc
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "not-needed")
+os.environ.setdefault("PROFILE_WATCH_INTERVAL", "0")
+
+from chatbot import engine  # noqa: E402
+from chatbot.tenants import TenantRegistry  # noqa: E402
+
+ME_DIR = Path(__file__).resolve().parent.parent.parent / "me"
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def make_tenants(root, count):
+    summary = (ME_DIR / "summary.txt").read_text(encoding="utf-8")
+    experience = (ME_DIR / "work_experience.txt").read_text(encoding="utf-8")
+    for i in range(count):
+        name = f"Person {i:03d}"
+        directory = root / f"t{i:03d}"
+        directory.mkdir(parents=True)
+        (directory / "tenant.json").write_text(f'{{"name": "{name}"}}', encoding="utf-8")
+        (directory / "summary.txt").write_text(summary.replace("Shrey Chauhan", name), encoding="utf-8")
+        (directory / "work_experience.txt").write_text(f"{experience}\n\nProfile {i}.", encoding="utf-8")
+        shutil.copy(ME_DIR / "shreyresume.docx", directory / "resume.docx")
+
+
+def percentiles(values):
+    values = sorted(values)
+    return (statistics.median(values) * 1000, values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+            values[-1] * 1000)
+
+
+async def load_all(registry, ids):
+    timings = []
+    for tenant_id in ids:
+        start = time.perf_counter()
+        await registry.get(tenant_id)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def make_registry(root, max_resident):
+    return TenantRegistry(
+        root,
+        build=lambda tenant: engine.Me(tenant, shared=engine.get_me_instance()),
+        max_resident=max_resident,
+        revalidate_interval=0
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=120)
+    parser.add_argument("--max-resident", type=int, default=32, help="LRU cap for the eviction run")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="tenants-bench-"))
+    engine.TENANT_CACHE_DIR = work / "cache"
+    try:
+        make_tenants(work / "tenants", args.tenants)
+        ids = [f"t{i:03d}" for i in range(args.tenants)]
+        default = engine.get_me_instance()
+        # Tokenizer, retrieval and intent state that every tenant shares
+        await default.build_messages("Hello", [])
+        default.fast_answer("Where did you study?", time.perf_counter())
+
+        gc.collect()
+        rss_before = rss_mb()
+        cold = await load_all(make_registry(work / "tenants", args.tenants), ids)
+        gc.collect()
+        rss_cold = rss_mb() - rss_before
+
+        # A restart: the extraction cache on disk is warm, memory is empty
+        registry = make_registry(work / "tenants", args.tenants)
+        warm = await load_all(registry, ids)
+
+        # The same once more under tracemalloc (which slows loads down) for the heap size
+        tracemalloc.start()
+        heap_before = tracemalloc.get_traced_memory()[0]
+        traced = make_registry(work / "tenants", args.tenants)
+        await load_all(traced, ids)
+        gc.collect()
+        heap = tracemalloc.get_traced_memory()[0] - heap_before
+        tracemalloc.stop()
+        del traced
+
+        # Exercise the resident path, including the per-tenant prompt build and FAQ facts
+        hits = []
+        for tenant_id in ids:
+            start = time.perf_counter()
+            me = await registry.get(tenant_id)
+            hits.append(time.perf_counter() - start)
+            await me.build_messages("What do you do at Quantum?", [])
+            me.fast_answer("Where did you study?", time.perf_counter())
+
+        # More tenants than fit: round-robin traffic makes every request a load
+        capped = make_registry(work / "tenants", args.max_resident)
+        churn = await load_all(capped, ids + ids)
+
+        clients = {id(me.openai) for me, _ in registry.resident.values()} | {id(default.openai)}
+        print(f"tenants: {args.tenants}  shared OpenAI clients: {len(clients)}")
+        print(f"{'load':<34}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+        for label, timings in [("cold (DOCX parsed)", cold), ("after restart (extraction cache)", warm),
+                               ("resident hit", hits),
+                               (f"LRU cap {args.max_resident}, round robin", churn)]:
+            p50, p95, worst = percentiles(timings)
+            print(f"{label:<34}{p50:>9.2f}{p95:>9.2f}{worst:>9.2f}")
+        print(f"evictions with cap {args.max_resident}: {capped.stats['evictions']}")
+        print(f"memory per resident tenant: {heap / args.tenants / 1024:.0f} KiB Python heap; "
+              f"RSS grew {rss_cold:.1f} MiB over the cold loads ({rss_cold * 1024 / args.tenants:.0f} KiB per tenant, "
+              "including DOCX parser garbage)")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        await engine.get_me_instance().openai.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Model round trips per conversation when visitors leave their email.
+
+Plays multi-turn conversations through Me.chat (or Me.chat_stream with
+--stream) against bench/fake_openai.py; one turn of every conversation
+contains an email address, which makes the fake model call
+record_user_details. Reports round trips per conversation and the latency
+of lead turns vs. other turns. Compare the single-response tool protocol
+with the old loop, and with a model that doesn't always answer alongside
+its tool calls (which falls back to the loop):
+
+    FAKE_OPENAI_LATENCY=0.3 FAKE_OPENAI_TOOL_TEXT_RATE=1 uvicorn bench.fake_openai:app --port 9100
+    OPENAI_BASE_URL=http://localhost:9100/v1 OPENAI_API_KEY=test python bench/tool_rounds.py
+    OPENAI_BASE_URL=http://localhost:9100/v1 OPENAI_API_KEY=test TOOL_SINGLE_RESPONSE=0 python bench/tool_rounds.py
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("PROFILE_WATCH_INTERVAL", "0")
+# Every turn must reach the model
+os.environ.setdefault("INTENT_ROUTER", "0")
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+os.environ.setdefault("ANALYTICS", "0")
+
+from chatbot import Me, engine  # noqa: E402
+from chatbot.metrics import llm_rounds, tool_turns_total  # noqa: E402
+
+
+def total_rounds():
+    # Sum of the per-request llm_rounds histogram
+    return llm_rounds.values.get((), [None, 0, 0])[1]
+
+
+QUESTIONS = [
+    "What do you do at Quantum?",
+    "How big is the team you manage?",
+    "What technologies do you work with?",
+    "Tell me about EnCloudEn",
+]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=30)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stream", action="store_true", help="use chat_stream instead of chat")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    me = Me()
+    rounds_per_conversation = []
+    latencies = {"lead": [], "other": []}
+
+    for i in range(args.conversations):
+        history = []
+        lead_turn = rng.randrange(args.turns)
+        rounds = 0
+        for turn in range(args.turns):
+            lead = turn == lead_turn
+            message = f"Sounds great, reach me at visitor{i}@example.com" if lead else rng.choice(QUESTIONS)
+            rounds_before = total_rounds()
+            start = time.perf_counter()
+            if args.stream:
+                reply = "".join([delta async for delta in me.chat_stream(message, history)])
+            else:
+                reply = await me.chat(message, history)
+            latencies["lead" if lead else "other"].append(time.perf_counter() - start)
+            rounds += total_rounds() - rounds_before
+            history += [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+        rounds_per_conversation.append(rounds)
+    await engine.registry.drain()
+
+    protocol = {dict(key).get("protocol"): value for key, value in tool_turns_total.values.items()}
+    print(f"single-response tools: {me.single_response_tools}  streaming: {args.stream}")
+    print(f"tool turns: {protocol.get('single_response', 0)} answered in one response, "
+          f"{protocol.get('extra_round', 0)} needed another round")
+    print(f"round trips per conversation: mean {statistics.mean(rounds_per_conversation):.2f}  "
+          f"max {max(rounds_per_conversation):.0f}  ({args.turns} turns each)")
+    for kind, values in latencies.items():
+        print(f"{kind + ' turns':<12} p50 {statistics.median(values) * 1000:7.0f} ms  "
+              f"mean {statistics.mean(values) * 1000:7.0f} ms  (n={len(values)})")
+    await me.openai.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
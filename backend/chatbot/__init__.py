@@ -0,0 +1,33 @@
+"""Chatbot engine shared by fastapi_app.py, api.py (Flask) and app.py (Gradio).
+
+    from chatbot import get_me_instance
+    reply = await get_me_instance().chat("Where do you work?", history=[])
+
+Submodules are imported on first use, so e.g. `chatbot.sessions` can be
+used without pulling in the OpenAI client, and python-docx / pypdf are only
+imported when a profile document actually has to be parsed.
+"""
+import importlib
+
+_EXPORTS = {
+    "Me": "engine",
+    "get_me_instance": "engine",
+    "get_tenant_instance": "engine",
+    "clean_history": "engine",
+    "warm_up": "engine",
+    "notifications": "engine",
+    "registry": "engine",
+    "UpstreamUnavailable": "resilience",
+    "UnknownTenant": "tenants",
+    "BackgroundLoop": "background",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module}", __name__), name)
+
+
+__all__ = sorted(_EXPORTS)
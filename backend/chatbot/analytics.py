@@ -0,0 +1,407 @@
+"""Local analytics: conversation turns, tool events and latencies in SQLite.
+
+`record_turn()` / `record_event()` only append a row to an in-memory buffer,
+so the request path never touches the disk. A worker task writes whatever
+has accumulated in one transaction every `flush_interval` seconds (sooner
+once `batch_size` rows are waiting), on a thread so the event loop doesn't
+wait on SQLite. The buffer is bounded: when the writer can't keep up the
+oldest rows are dropped and counted. Tables are append-only and the file is
+in WAL mode, so several gunicorn workers can write to it while it is being
+queried.
+
+    python -m chatbot.analytics unanswered --days 7
+    python -m chatbot.analytics latency --days 1
+    python -m chatbot.analytics leads
+    python -m chatbot.analytics prompt-cache
+    python -m chatbot.analytics rounds --days 1
+    python -m chatbot.analytics unanswered --tenant alice
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+from .sqlitedb import ForkSafeConnection
+
+# Set by the server for the current request so turns and tool events can be grouped per conversation
+current_session = contextvars.ContextVar("analytics_session_id", default=None)
+# ... and per hosted profile; None is the site owner's own profile
+current_tenant = contextvars.ContextVar("analytics_tenant", default=None)
+
+# backend/analytics.db, next to the other local stores
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "analytics.db"
+
+# Message and reply text is kept for reading back, not for full transcripts
+MAX_TEXT_CHARS = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session TEXT,
+    route TEXT NOT NULL,
+    intent TEXT,
+    outcome TEXT NOT NULL,
+    latency_ms REAL NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    tool_calls INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    reply TEXT,
+    cached_tokens INTEGER NOT NULL DEFAULT 0,
+    prompt_version TEXT,
+    tenant TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_ts ON turns (ts);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session TEXT,
+    kind TEXT NOT NULL,
+    name TEXT,
+    outcome TEXT,
+    latency_ms REAL,
+    data TEXT,
+    tenant TEXT
+);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+"""
+
+# Columns added after the first release; (table, column, definition)
+MIGRATIONS = [
+    ("turns", "cached_tokens", "INTEGER NOT NULL DEFAULT 0"),
+    ("turns", "prompt_version", "TEXT"),
+    ("turns", "tenant", "TEXT"),
+    ("events", "tenant", "TEXT"),
+]
+
+TURN_COLUMNS = ("ts", "session", "route", "intent", "outcome", "latency_ms", "prompt_tokens",
+                "completion_tokens", "rounds", "tool_calls", "message", "reply", "cached_tokens", "prompt_version",
+                "tenant")
+EVENT_COLUMNS = ("ts", "session", "kind", "name", "outcome", "latency_ms", "data", "tenant")
+
+# Appended to report queries; rows written before tenants existed belong to the site owner
+TENANT_FILTER = " AND (? IS NULL OR COALESCE(tenant, 'default') = ?)"
+
+
+def _clip(text):
+    return text[:MAX_TEXT_CHARS] if isinstance(text, str) else text
+
+
+class AnalyticsStore:
+    def __init__(self, path, flush_interval=2.0, batch_size=500, max_buffer=10000, enabled=True):
+        """
+        path: SQLite file; created on first write
+        flush_interval: seconds between writes while rows are waiting
+        max_buffer: rows kept in memory before the oldest are dropped
+        """
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self.buffer = deque()
+        self.max_buffer = max_buffer
+        self.stats = {"written": 0, "dropped": 0, "write_errors": 0}
+        self.lock = threading.Lock()
+        self.wakeup = None
+        self.worker = None
+        self.connection = ForkSafeConnection(self.path, setup=self._setup, timeout=10)
+
+    @staticmethod
+    def _setup(db):
+        # WAL keeps commits consistent without an fsync per batch; a crash can lose the last batch
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        for table, column, definition in MIGRATIONS:
+            columns = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @property
+    def db(self):
+        return self.connection.get()
+
+    def start(self):
+        """Start the writer task on the running loop"""
+        if not self.enabled:
+            return
+        self.wakeup = asyncio.Event()
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and write out whatever is still buffered"""
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        self.worker = None
+        await asyncio.to_thread(self.flush)
+
+    def record_turn(self, route, message, reply, latency, stats=None, intent=None, outcome="ok"):
+        """Buffer one answered (or failed) chat turn; latency in seconds"""
+        stats = stats or {}
+        self._append("turns", (
+            time.time(), current_session.get(), route, intent, outcome, round(latency * 1000, 2),
+            stats.get("prompt_tokens", 0), stats.get("completion_tokens", 0), stats.get("rounds", 0),
+            stats.get("tool_calls", 0), _clip(message), _clip(reply), stats.get("cached_tokens", 0),
+            stats.get("prompt_version"), current_tenant.get(),
+        ))
+
+    def record_event(self, kind, name=None, outcome=None, latency=None, **data):
+        """Buffer a tool call, unknown question, lead, ...; extra keyword arguments are stored as JSON"""
+        self._append("events", (
+            time.time(), current_session.get(), kind, name, outcome,
+            round(latency * 1000, 2) if latency is not None else None,
+            json.dumps({key: _clip(value) for key, value in data.items()}) if data else None,
+            current_tenant.get(),
+        ))
+
+    def _append(self, table, row):
+        if not self.enabled:
+            return
+        if len(self.buffer) >= self.max_buffer:
+            self.buffer.popleft()
+            self.stats["dropped"] += 1
+        self.buffer.append((table, row))
+        if self.wakeup is not None and len(self.buffer) >= self.batch_size:
+            self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            if self.buffer:
+                await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """Write the buffered rows in one transaction (blocking; called off the event loop)"""
+        batch = []
+        while self.buffer:
+            batch.append(self.buffer.popleft())
+        if not batch:
+            return
+        turns = [row for table, row in batch if table == "turns"]
+        events = [row for table, row in batch if table == "events"]
+        with self.lock:
+            db = None
+            try:
+                db = self.db
+                db.execute("BEGIN")
+                if turns:
+                    db.executemany(
+                        f"INSERT INTO turns ({', '.join(TURN_COLUMNS)}) VALUES ({', '.join('?' * len(TURN_COLUMNS))})",
+                        turns
+                    )
+                if events:
+                    db.executemany(
+                        f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})",
+                        events
+                    )
+                db.execute("COMMIT")
+                self.stats["written"] += len(batch)
+            except sqlite3.Error as e:
+                if db is not None and db.in_transaction:
+                    db.execute("ROLLBACK")
+                self.stats["write_errors"] += 1
+                # Put the rows back for the next flush, within the buffer bound
+                room = max(0, self.max_buffer - len(self.buffer))
+                self.buffer.extendleft(reversed(batch[-room:] if room else []))
+                self.stats["dropped"] += len(batch) - min(room, len(batch))
+                print(f"Warning: could not write analytics: {e}")
+
+    # Queries; they read committed rows, so the last flush_interval of traffic may be missing
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def top_unanswered(self, since=None, limit=20, tenant=None):
+        """Questions the model recorded as unanswered, grouped by normalized text, most frequent first"""
+        rows = self.query(
+            "SELECT ts, data FROM events WHERE kind = 'unknown_question' AND ts >= ?" + TENANT_FILTER + " ORDER BY ts",
+            (since or 0, tenant, tenant)
+        )
+        groups = {}
+        for ts, data in rows:
+            question = (json.loads(data or "{}").get("question") or "").strip()
+            if not question:
+                continue
+            key = " ".join(re.findall(r"\w+", question.lower()))
+            entry = groups.setdefault(key, {"question": question, "count": 0, "first_seen": ts})
+            entry["count"] += 1
+            entry["last_seen"] = ts
+        return sorted(groups.values(), key=lambda entry: (-entry["count"], -entry["last_seen"]))[:limit]
+
+    def latency_distribution(self, since=None, tenant=None):
+        """Per-route turn latency percentiles (ms) and outcome counts"""
+        rows = self.query(
+            "SELECT route, outcome, latency_ms FROM turns WHERE ts >= ?" + TENANT_FILTER + " ORDER BY route, latency_ms",
+            (since or 0, tenant, tenant)
+        )
+        routes = {}
+        for route, outcome, latency_ms in rows:
+            entry = routes.setdefault(route, {"latencies": [], "outcomes": Counter()})
+            entry["latencies"].append(latency_ms)
+            entry["outcomes"][outcome] += 1
+
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(len(values) * q))]
+
+        return {
+            route: {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.5),
+                "p90_ms": percentile(values, 0.9),
+                "p99_ms": percentile(values, 0.99),
+                "max_ms": values[-1],
+                "mean_ms": round(sum(values) / len(values), 2),
+                "outcomes": dict(entry["outcomes"]),
+            }
+            for route, entry in routes.items()
+            for values in [entry["latencies"]]
+        }
+
+    def prompt_cache(self, since=None, tenant=None):
+        """Per prompt version: share of prompt tokens served from OpenAI's prefix cache, and
+        model-turn latency (ms) with and without a cache hit"""
+        rows = self.query(
+            "SELECT prompt_version, prompt_tokens, cached_tokens, latency_ms FROM turns "
+            "WHERE route = 'llm' AND outcome = 'ok' AND ts >= ?" + TENANT_FILTER + " ORDER BY latency_ms",
+            (since or 0, tenant, tenant)
+        )
+        versions = {}
+        for version, prompt_tokens, cached_tokens, latency_ms in rows:
+            entry = versions.setdefault(version or "-", {"prompt_tokens": 0, "cached_tokens": 0, "hit": [], "miss": []})
+            entry["prompt_tokens"] += prompt_tokens
+            entry["cached_tokens"] += cached_tokens
+            entry["hit" if cached_tokens else "miss"].append(latency_ms)
+        return {
+            version: {
+                "turns": len(entry["hit"]) + len(entry["miss"]),
+                "cache_hit_turns": len(entry["hit"]),
+                "cached_token_share": round(entry["cached_tokens"] / entry["prompt_tokens"], 3) if entry["prompt_tokens"] else 0.0,
+                "p50_ms_hit": entry["hit"][len(entry["hit"]) // 2] if entry["hit"] else None,
+                "p50_ms_miss": entry["miss"][len(entry["miss"]) // 2] if entry["miss"] else None,
+            }
+            for version, entry in versions.items()
+        }
+
+    def round_trips(self, since=None, tenant=None):
+        """Model round trips per conversation, and per turn with and without tool calls"""
+        rows = self.query(
+            "SELECT session, rounds, tool_calls FROM turns WHERE route = 'llm' AND session IS NOT NULL AND ts >= ?"
+            + TENANT_FILTER,
+            (since or 0, tenant, tenant)
+        )
+        conversations = Counter()
+        turns = {"tool": [], "plain": []}
+        for session, rounds, tool_calls in rows:
+            conversations[session] += rounds
+            turns["tool" if tool_calls else "plain"].append(rounds)
+        per_conversation = sorted(conversations.values())
+
+        def mean(values):
+            return round(sum(values) / len(values), 3) if values else None
+
+        return {
+            "conversations": len(per_conversation),
+            "rounds": sum(per_conversation),
+            "per_conversation": {
+                "mean": mean(per_conversation),
+                "p50": per_conversation[len(per_conversation) // 2] if per_conversation else None,
+                "p90": per_conversation[min(len(per_conversation) - 1, int(len(per_conversation) * 0.9))]
+                if per_conversation else None,
+                "max": per_conversation[-1] if per_conversation else None,
+            },
+            "tool_turns": len(turns["tool"]),
+            "rounds_per_tool_turn": mean(turns["tool"]),
+            "rounds_per_plain_turn": mean(turns["plain"]),
+        }
+
+    def leads(self, since=None, limit=50, tenant=None):
+        """Contact details left by visitors, newest first"""
+        rows = self.query(
+            "SELECT ts, session, tenant, name, data FROM events WHERE kind = 'lead' AND ts >= ?" + TENANT_FILTER
+            + " ORDER BY ts DESC LIMIT ?",
+            (since or 0, tenant, tenant, limit)
+        )
+        # The visitor's name is in the name column, like a tool event's tool name
+        return [{"ts": ts, "session": session, "tenant": tenant or "default", "name": name, **json.loads(data or "{}")}
+                for ts, session, tenant, name, data in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the local chatbot analytics database")
+    parser.add_argument("report", choices=["unanswered", "latency", "leads", "prompt-cache", "rounds"])
+    parser.add_argument("--db", default=os.getenv("ANALYTICS_DB_PATH", str(DEFAULT_PATH)))
+    parser.add_argument("--days", type=float, default=7, help="only look at the last N days (0 for everything)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--tenant", help="only one hosted profile (\"default\" is the site owner's)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist yet")
+    store = AnalyticsStore(args.db)
+    since = time.time() - args.days * 86400 if args.days else None
+
+    if args.report == "unanswered":
+        result = store.top_unanswered(since, args.limit, args.tenant)
+        if not args.json:
+            for entry in result:
+                last_seen = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_seen"]))
+                print(f"{entry['count']:>5}  {last_seen}  {entry['question']}")
+            return
+    elif args.report == "latency":
+        result = store.latency_distribution(since, args.tenant)
+        if not args.json:
+            print(f"{'route':<10} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}  outcomes")
+            for route, entry in sorted(result.items()):
+                print(f"{route:<10} {entry['count']:>7} {entry['p50_ms']:>9.1f} {entry['p90_ms']:>9.1f} "
+                      f"{entry['p99_ms']:>9.1f} {entry['max_ms']:>9.1f}  {entry['outcomes']}")
+            return
+    elif args.report == "prompt-cache":
+        result = store.prompt_cache(since, args.tenant)
+        if not args.json:
+            print(f"{'prompt version':<18} {'turns':>7} {'cache hits':>10} {'cached share':>12} {'p50 hit ms':>11} {'p50 miss ms':>12}")
+            for version, entry in sorted(result.items()):
+                hit = f"{entry['p50_ms_hit']:.1f}" if entry["p50_ms_hit"] is not None else "-"
+                miss = f"{entry['p50_ms_miss']:.1f}" if entry["p50_ms_miss"] is not None else "-"
+                print(f"{version:<18} {entry['turns']:>7} {entry['cache_hit_turns']:>10} "
+                      f"{entry['cached_token_share']:>12.1%} {hit:>11} {miss:>12}")
+            return
+    elif args.report == "rounds":
+        result = store.round_trips(since, args.tenant)
+        if not args.json:
+            per = result["per_conversation"]
+            print(f"conversations:         {result['conversations']} ({result['rounds']} model round trips)")
+            print(f"rounds / conversation: mean {per['mean']}  p50 {per['p50']}  p90 {per['p90']}  max {per['max']}")
+            print(f"rounds / tool turn:    {result['rounds_per_tool_turn']} over {result['tool_turns']} turns")
+            print(f"rounds / other turn:   {result['rounds_per_plain_turn']}")
+            return
+    else:
+        result = store.leads(since, args.limit, args.tenant)
+        if not args.json:
+            for entry in result:
+                seen = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["ts"]))
+                print(f"{seen}  {entry.get('email')}  {entry.get('name')}  {entry.get('notes')}")
+            return
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
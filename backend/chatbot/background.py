@@ -0,0 +1,51 @@
+"""Run the async engine from synchronous servers (Flask, Gradio).
+
+A single event loop lives in a daemon thread. Request threads submit
+coroutines to it and block on the result, so the engine's shared HTTP
+clients, caches and notification worker all stay on one loop.
+"""
+import asyncio
+import os
+import threading
+
+from . import engine
+
+
+class BackgroundLoop:
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the loop thread and warm the engine on it (idempotent, fork-aware)"""
+        with self._lock:
+            # A forked worker inherits the attributes but not the thread
+            if self.loop is not None and self._pid == os.getpid():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, name="chatbot-loop", daemon=True)
+            self.thread.start()
+            self._pid = os.getpid()
+        self.run(self._start_engine())
+
+    async def _start_engine(self):
+        engine.notifications.start()
+        engine.analytics.start()
+        await engine.warm_up()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the background loop and return its result"""
+        if self.loop is None or self._pid != os.getpid():
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self, timeout=10):
+        """Flush notifications and close clients, then stop the loop"""
+        if self.loop is None:
+            return
+        self.run(engine.close(), timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.loop = None
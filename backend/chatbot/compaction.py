@@ -0,0 +1,157 @@
+"""Token-budget aware history compaction.
+
+Before each model call the conversation is fitted into a prompt budget:
+the most recent turns are kept verbatim and everything older is folded
+into a rolling summary. Summaries are cached by a hash of the history
+prefix they cover, so a conversation only pays for a summarization call
+when a new block of turns falls out of the verbatim window, and each call
+only summarizes that block on top of the previous summary.
+
+Tokens are counted with tiktoken's o200k_base encoding. tiktoken downloads
+the encoding on first use and keeps it in TIKTOKEN_CACHE_DIR, which
+defaults to backend/.tiktoken_cache; the deploy build fills it, so servers
+don't fetch it at startup. Without the encoding, counts fall back to an
+estimate that undercounts code, URLs and non-English text.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(Path(__file__).resolve().parent.parent / ".tiktoken_cache"))
+
+# Per-message overhead the chat format adds on top of the content tokens
+MESSAGE_OVERHEAD = 4
+
+_encoding = None
+
+
+def load_encoding():
+    """The o200k_base encoding, or None when tiktoken or the encoding file isn't available"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Not installed, or the encoding file can't be fetched; don't retry on every call
+            print(f"Warning: tiktoken unavailable ({type(e).__name__}: {e}); estimating ~4 characters per token")
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when available, otherwise estimate ~4 characters per token"""
+    encoding = load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text or "", disallowed_special=()))
+    return len(text or "") // 4 + 1
+
+
+def message_tokens(message):
+    return count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD
+
+
+class HistoryCompactor:
+    def __init__(self, summarize=None, max_prompt_tokens=6000, recent_tokens=1500,
+                 fold_threshold_tokens=3000, summary_cache_size=1024):
+        """
+        summarize: async callable(previous_summary, turns) -> new summary; None only drops old turns
+        max_prompt_tokens: hard budget for system prompt + summary + history + new message
+        recent_tokens: target size of the verbatim tail right after a fold
+        fold_threshold_tokens: the verbatim tail may grow to this size before the next fold
+        """
+        self.summarize = summarize
+        self.max_prompt_tokens = max_prompt_tokens
+        self.recent_tokens = recent_tokens
+        self.fold_threshold_tokens = max(fold_threshold_tokens, recent_tokens)
+        self.summaries = OrderedDict()
+        self.summary_cache_size = summary_cache_size
+        self.summary_calls = 0
+
+    async def build_messages(self, system_prompt, history, message, context=None):
+        """Return the message list to send, guaranteed under budget whenever system prompt + message fit.
+
+        context: per-message system content (e.g. retrieved background), placed after the
+        history so the system prompt and history stay a stable prefix from turn to turn
+        """
+        system = {"role": "system", "content": system_prompt}
+        user = {"role": "user", "content": message}
+        latest = [{"role": "system", "content": context}, user] if context else [user]
+        fixed = message_tokens(system) + sum(message_tokens(item) for item in latest)
+        costs = [message_tokens(item) for item in history]
+
+        if fixed + sum(costs) <= self.max_prompt_tokens:
+            return [system] + history + latest
+
+        summary, cutoff = "", 0
+        if self.summarize is not None:
+            summary, cutoff = await self._rolling_summary(history, costs)
+
+        summary_message = None
+        if summary:
+            summary_message = {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+            fixed += message_tokens(summary_message)
+
+        # Whatever is still over budget is dropped from the oldest end of the verbatim tail
+        start = cutoff
+        tail_cost = sum(costs[start:])
+        while start < len(history) and (fixed + tail_cost > self.max_prompt_tokens or history[start]["role"] != "user"):
+            tail_cost -= costs[start]
+            start += 1
+
+        messages = [system]
+        if summary_message:
+            messages.append(summary_message)
+        return messages + history[start:] + latest
+
+    async def _rolling_summary(self, history, costs):
+        """Return (summary, cutoff) where summary covers history[:cutoff]"""
+        prefix_hashes = self._prefix_hashes(history)
+
+        # Reuse the newest cached summary whose verbatim tail is still small enough
+        for cutoff in range(len(history), 0, -1):
+            summary = self.summaries.get(prefix_hashes[cutoff])
+            if summary is None:
+                continue
+            self.summaries.move_to_end(prefix_hashes[cutoff])
+            if sum(costs[cutoff:]) <= self.fold_threshold_tokens:
+                return summary, cutoff
+            previous, previous_cutoff = summary, cutoff
+            break
+        else:
+            previous, previous_cutoff = "", 0
+
+        # Fold everything but the last recent_tokens worth of turns, cutting before a user turn
+        cutoff = len(history)
+        tail = 0
+        while cutoff > previous_cutoff and tail + costs[cutoff - 1] <= self.recent_tokens:
+            cutoff -= 1
+            tail += costs[cutoff]
+        while cutoff < len(history) and history[cutoff]["role"] != "user":
+            cutoff += 1
+        if cutoff <= previous_cutoff:
+            return previous, previous_cutoff
+
+        try:
+            summary = await self.summarize(previous, history[previous_cutoff:cutoff])
+        except Exception as e:
+            print(f"Warning: history summarization failed, dropping old turns instead: {e}")
+            return previous, previous_cutoff
+        self.summary_calls += 1
+
+        self.summaries[prefix_hashes[cutoff]] = summary
+        while len(self.summaries) > self.summary_cache_size:
+            self.summaries.popitem(last=False)
+        return summary, cutoff
+
+    @staticmethod
+    def _prefix_hashes(history):
+        """hashes[i] identifies history[:i]; chained so computing all of them is linear"""
+        digest = hashlib.sha256()
+        hashes = [digest.hexdigest()]
+        for item in history:
+            digest.update(json.dumps([item.get("role"), item.get("content")]).encode())
+            hashes.append(digest.copy().hexdigest())
+        return hashes
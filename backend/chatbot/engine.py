@@ -0,0 +1,691 @@
+"""The chatbot engine shared by the FastAPI, Flask and Gradio entry points.
+
+Holds the tool registry, the background notification queue and `Me`: the
+profile corpus, prompt building, caches and the instrumented, resilient chat
+loop. The servers are thin adapters that turn their requests into
+`Me.chat()` / `Me.chat_stream()` calls.
+"""
+import asyncio
+import contextvars
+import hashlib
+import os
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+# Configuration is read from the environment at import time below
+load_dotenv(override=True)
+
+from . import metrics  # noqa: E402
+from .analytics import AnalyticsStore, current_tenant  # noqa: E402
+from .compaction import HistoryCompactor  # noqa: E402
+from .intents import IntentRouter  # noqa: E402
+from .metrics import span  # noqa: E402
+from .notifications import NotificationQueue  # noqa: E402
+from .profile_corpus import ProfileCorpus  # noqa: E402
+from .resilience import CircuitBreaker, ResilientChat, UpstreamUnavailable  # noqa: E402
+from .response_cache import ResponseCache  # noqa: E402
+from .retrieval import build_index  # noqa: E402
+from .tenants import DEFAULT_TENANT, TenantRegistry  # noqa: E402
+from .tools import ToolRegistry  # noqa: E402
+
+# backend/, where the on-disk caches and spools live; me/ sits next to it
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Extracted text of hosted tenants' documents, one JSON file per tenant
+TENANT_CACHE_DIR = Path(os.getenv("TENANT_CACHE_DIR", str(BACKEND_DIR / ".tenant_cache")))
+
+# Set by callers that want every finished turn of the current task reported back (the replay runner)
+turn_log = contextvars.ContextVar("turn_log", default=None)
+
+# Shared HTTP client so outbound notifications reuse pooled connections
+http_client = None
+
+def get_http_client():
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=5,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+    return http_client
+
+async def push(text):
+    """Send notification via Pushover (optional). Raises on delivery failure so the queue can retry."""
+    if os.getenv("PUSHOVER_TOKEN") and os.getenv("PUSHOVER_USER"):
+        with span("pushover_push"):
+            response = await get_http_client().post(
+                os.getenv("PUSHOVER_API_URL", "https://api.pushover.net/1/messages.json"),
+                data={
+                    "token": os.getenv("PUSHOVER_TOKEN"),
+                    "user": os.getenv("PUSHOVER_USER"),
+                    "message": text,
+                }
+            )
+        response.raise_for_status()
+
+# Notifications are delivered in the background so tool calls never wait on Pushover
+notifications = NotificationQueue(
+    push,
+    spool_path=os.getenv("NOTIFICATION_SPOOL_PATH", str(BACKEND_DIR / ".notification_spool.jsonl")),
+    batch_window=float(os.getenv("NOTIFICATION_BATCH_WINDOW", "2.0"))
+)
+
+# Turns, tool calls, unknown questions and leads, written to SQLite off the request path
+analytics = AnalyticsStore(
+    os.getenv("ANALYTICS_DB_PATH", str(BACKEND_DIR / "analytics.db")),
+    flush_interval=float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "2.0")),
+    max_buffer=int(os.getenv("ANALYTICS_MAX_BUFFER", "10000")),
+    enabled=os.getenv("ANALYTICS", "1").lower() in ("1", "true", "yes")
+)
+
+# OpenAI function definitions
+record_user_details_json = {
+    "name": "record_user_details",
+    "description": "Use this tool to record that a user is interested in being in touch and provided an email address. Always include the user's message or a summary of the conversation in the notes field.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "email": {"type": "string", "description": "The email address of this user"},
+            "name": {"type": "string", "description": "The user's name, if they provided it. Use 'Name not provided' if the user didn't share their name."},
+            "notes": {"type": "string", "description": "The user's message or a brief summary of what they discussed. This should include the conversation context or the reason they're reaching out."}
+        },
+        "required": ["email"],
+        "additionalProperties": False
+    }
+}
+
+record_unknown_question_json = {
+    "name": "record_unknown_question",
+    "description": "Always use this tool to record any question that couldn't be answered as you didn't know the answer",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "question": {"type": "string", "description": "The question that couldn't be answered"}
+        },
+        "required": ["question"],
+    }
+}
+
+# Only registered functions can be called by the model
+registry = ToolRegistry(
+    default_timeout=float(os.getenv("TOOL_TIMEOUT", "5")),
+    observer=lambda name, seconds, outcome: analytics.record_event("tool", name=name, outcome=outcome, latency=seconds)
+)
+
+@registry.register(record_user_details_json, side_effect_only=True)
+async def record_user_details(email, name="Name not provided", notes="not provided"):
+    """Record user contact information"""
+    # Validate email is provided
+    if not email or email.strip() == "":
+        email = "No email provided"
+    
+    # Format a more informative notification
+    notification_parts = [f"📧 New Contact: {email}"]
+    tenant = current_tenant.get()
+    if tenant and tenant != DEFAULT_TENANT:
+        notification_parts.append(f"Profile: {tenant}")
+    if name and name != "Name not provided" and name.strip():
+        notification_parts.append(f"Name: {name}")
+    if notes and notes != "not provided" and notes.strip():
+        notification_parts.append(f"\n💬 Conversation:\n{notes}")
+    
+    notifications.enqueue("\n".join(notification_parts))
+    analytics.record_event("lead", email=email, name=name, notes=notes)
+    return {"recorded": "ok"}
+
+@registry.register(record_unknown_question_json, side_effect_only=True)
+async def record_unknown_question(question):
+    """Record questions that couldn't be answered"""
+    notifications.enqueue(f"Recording unknown question: {question}")
+    analytics.record_event("unknown_question", question=question)
+    return {"recorded": "ok"}
+
+tools = registry.schemas()
+
+DEFAULT_SUMMARY = "Shrey Chauhan is a Senior Engineering Manager at Quantum, where he leads the Unified Surveillance Platform (USP) engineering team."
+
+# Documents that are chunked for retrieval; the summary and resume are always sent in full, so the
+# static part of the prompt stays above the provider's 1024-token minimum for prefix caching
+RETRIEVAL_SOURCES = ["work_experience.txt"]
+
+def normalize_text(text):
+    """Canonical form of a profile document (LF line endings, no trailing spaces), so the
+    prompt is byte-identical however the file was edited or extracted"""
+    lines = (text or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+def content_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+def tool_call_message(content, tool_calls):
+    """The assistant turn that requested tool calls, as a plain dict.
+
+    Appending the SDK's message object instead would make the client dump the
+    whole pydantic model (refusal, audio, annotations, ...) again every round.
+    """
+    return {
+        "role": "assistant",
+        "content": content,
+        "tool_calls": [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments}
+            }
+            for call in tool_calls
+        ]
+    }
+
+def new_chat_stats():
+    """Per-request counters filled in by the chat loop"""
+    return {"rounds": 0, "tool_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+            "prompt_version": None}
+
+def add_usage(stats, usage):
+    """Add one response's token usage, including prompt tokens served from the provider's prefix cache"""
+    stats["prompt_tokens"] += usage.prompt_tokens
+    stats["completion_tokens"] += usage.completion_tokens
+    details = getattr(usage, "prompt_tokens_details", None)
+    stats["cached_tokens"] += getattr(details, "cached_tokens", None) or 0
+
+class Me:
+    def __init__(self, tenant=None, shared=None):
+        """
+        tenant: the hosted profile to speak for (see chatbot.tenants); None for the site owner in me/
+        shared: an existing Me whose OpenAI client, resilience state, compactor and intent router
+            are reused, so extra tenants add only their profile, prompt and response cache
+        """
+        self.tenant_id = tenant.id if tenant else DEFAULT_TENANT
+        if shared is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it in Railway Variables.")
+            # Retries happen in ResilientChat, which also knows about deadlines, hedging and fallback
+            self.openai = AsyncOpenAI(api_key=api_key, max_retries=0)
+            self.llm = ResilientChat(
+                self.openai,
+                model=os.getenv("CHAT_MODEL", "gpt-4o-mini"),
+                fallback_model=os.getenv("CHAT_FALLBACK_MODEL") or None,
+                timeout=float(os.getenv("UPSTREAM_TIMEOUT", "30")),
+                retries=int(os.getenv("UPSTREAM_RETRIES", "2")),
+                hedge_after=float(os.getenv("UPSTREAM_HEDGE_AFTER", "0")),
+                fallback_cooldown=float(os.getenv("UPSTREAM_FALLBACK_COOLDOWN", "30")),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+                    reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+                )
+            )
+
+            # Long conversations are fitted into a token budget by summarizing older turns
+            self.summary_model = os.getenv("COMPACTION_SUMMARY_MODEL", "gpt-4o-mini")
+            self.compactor = HistoryCompactor(
+                summarize=self.summarize_turns,
+                max_prompt_tokens=int(os.getenv("COMPACTION_MAX_PROMPT_TOKENS", "6000")),
+                recent_tokens=int(os.getenv("COMPACTION_RECENT_TOKENS", "1500")),
+                fold_threshold_tokens=int(os.getenv("COMPACTION_FOLD_THRESHOLD_TOKENS", "3000"))
+            )
+
+            # FAQ-style questions answered from templates without calling the model
+            self.router = IntentRouter(
+                threshold=float(os.getenv("INTENT_THRESHOLD", "0.6")),
+                min_coverage=float(os.getenv("INTENT_MIN_COVERAGE", "0.75"))
+            ) if os.getenv("INTENT_ROUTER", "1").lower() in ("1", "true", "yes") else None
+        else:
+            self.openai = shared.openai
+            self.llm = shared.llm
+            self.summary_model = shared.summary_model
+            self.compactor = shared.compactor
+            self.router = shared.router
+
+        if tenant is None:
+            self.name = "Shrey Chauhan"
+            self.contact_email = os.getenv("CONTACT_EMAIL")
+            self.default_summary = DEFAULT_SUMMARY
+            self.resume_source = "shreyresume.docx"
+            me_dir = BACKEND_DIR.parent / "me"
+            cache_path = os.getenv("PROFILE_CACHE_PATH", str(BACKEND_DIR / ".profile_cache.json"))
+        else:
+            self.name = tenant.name
+            self.contact_email = tenant.contact_email
+            self.default_summary = f"{tenant.name} is a professional whose background is described below."
+            self.resume_source = tenant.resume
+            me_dir = tenant.me_dir
+            cache_path = TENANT_CACHE_DIR / f"{tenant.id}.json"
+
+        self.cache = ResponseCache(
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            fuzzy_threshold=float(os.getenv("RESPONSE_CACHE_FUZZY_THRESHOLD", "0.9"))
+        )
+
+        # Number of profile chunks retrieved per message; 0 sends every document in full
+        self.retrieval_top_k = int(os.getenv("PROFILE_RETRIEVAL_TOP_K", "4"))
+        # (snapshot, text, hash) of the static system prompt used with retrieval
+        self._retrieval_prompt = (None, None, None)
+        # Answer in the same model response that calls side-effect-only tools, instead of a second round
+        self.single_response_tools = os.getenv("TOOL_SINGLE_RESPONSE", "1").lower() in ("1", "true", "yes")
+        # Requests with the same prompt version share a cache key, which helps OpenAI route them
+        # to a server that already holds the prefix; 0 for OpenAI-compatible servers that reject it
+        self.prompt_cache_key = os.getenv("PROMPT_CACHE_KEY", "1").lower() in ("1", "true", "yes")
+
+        # Extracted text is cached on disk, so DOCX parsing only happens when the file changes
+        self.profile = ProfileCorpus(
+            me_dir,
+            sources=["summary.txt", self.resume_source, "work_experience.txt"],
+            cache_path=cache_path,
+            build_prompt=self.build_system_prompt,
+            build_index=lambda documents: build_index(documents, RETRIEVAL_SOURCES)
+        )
+        snapshot = self.profile.load()
+        if tenant is None:
+            print(f"✅ Loaded profile corpus (version {snapshot.version}, prompt {len(snapshot.system_prompt)} characters, "
+                  f"prompt version {snapshot.prompt_version})")
+        if not snapshot.get("summary.txt"):
+            print(f"Warning: {me_dir / 'summary.txt'} not found. Using default summary.")
+
+        # The watcher thread is started per worker in warm_up(); threads don't survive fork
+        self.watch_interval = float(os.getenv("PROFILE_WATCH_INTERVAL", "5"))
+
+    async def handle_tool_call(self, tool_calls):
+        # Tool calls from one model turn run concurrently, each with its own timeout
+        return await registry.run(tool_calls)
+
+    def dispatch_side_effects(self, content, tool_calls):
+        """Record side-effect-only tool calls in the background when the response already holds
+        the reply; returns False when the loop needs another round to get one"""
+        if not self.single_response_tools or not (content or "").strip() or not registry.side_effect_only(tool_calls):
+            metrics.tool_turns_total.inc(protocol="extra_round")
+            return False
+        registry.dispatch(tool_calls)
+        metrics.tool_turns_total.inc(protocol="single_response")
+        return True
+    
+    def prompt_header(self):
+        return f"""You are acting as {self.name}. You are answering questions on {self.name}'s website, \
+particularly questions related to {self.name}'s career, background, skills and experience. \
+Your responsibility is to represent {self.name} for interactions on the website as faithfully as possible. \
+You are given a summary of {self.name}'s background and resume which you can use to answer questions. \
+Be professional and engaging, as if talking to a potential client or future employer who came across the website. \
+If you don't know the answer to any question, use your record_unknown_question tool to record the question that you couldn't answer, even if it's about something trivial or unrelated to career. \
+If the user is engaging in discussion, try to steer them towards getting in touch via email; ask for their email and record it using your record_user_details tool. \
+When recording user details, always include the user's message or a summary of the conversation in the 'notes' parameter so {self.name} knows what they were interested in. \
+Both tools only record information and return nothing you need, so whenever you call one, write your reply to the user in the same response."""
+
+    def prompt_footer(self):
+        return f"With this context, please chat with the user, always staying in character as {self.name}."
+
+    def build_system_prompt(self, documents):
+        """Full-context prompt; built once per corpus load, and identical for identical documents"""
+        summary = normalize_text(documents.get("summary.txt")) or self.default_summary
+        resume = normalize_text(documents.get(self.resume_source))
+        work_experience = normalize_text(documents.get("work_experience.txt"))
+
+        system_prompt = self.prompt_header()
+        system_prompt += f"\n\n## Summary:\n{summary}\n\n## Resume:\n{resume}\n\n"
+        
+        # Add work experience if available
+        if work_experience:
+            system_prompt += f"## Detailed Work Experience:\n{work_experience}\n\n"
+        
+        system_prompt += self.prompt_footer()
+        return system_prompt
+
+    def retrieval_prompt(self, snapshot):
+        """Static system prompt for retrieval mode: instructions, summary and resume, but no chunks"""
+        if self._retrieval_prompt[0] is not snapshot:
+            summary = normalize_text(snapshot.get("summary.txt")) or self.default_summary
+            resume = normalize_text(snapshot.get(self.resume_source))
+            text = f"{self.prompt_header()}\n\n## Summary:\n{summary}\n\n## Resume:\n{resume}\n\n"
+            text += f"{self.prompt_footer()} The parts of {self.name}'s detailed work experience relevant " \
+                "to each message are given in a system message just before it."
+            self._retrieval_prompt = (snapshot, text, content_hash(text))
+        return self._retrieval_prompt[1], self._retrieval_prompt[2]
+
+    def system_prompt(self, message=None, history=None):
+        """Return (system prompt, per-message context or None, prompt version).
+
+        The system prompt depends only on the profile, so it (and the conversation after it)
+        is a byte-identical prefix that the provider can cache across requests, workers and
+        restarts; everything that varies per message goes into the context, sent last.
+        """
+        snapshot = self.profile.snapshot
+        if not message or self.retrieval_top_k <= 0 or snapshot.index is None:
+            # Prebuilt whenever the corpus (re)loads
+            return snapshot.system_prompt, None, snapshot.prompt_version
+
+        # Include the previous user turn so short follow-ups ("tell me more") still retrieve context
+        query = message
+        for item in reversed(history or []):
+            if item.get("role") == "user":
+                query = f"{item.get('content', '')} {message}"
+                break
+
+        system_prompt, version = self.retrieval_prompt(snapshot)
+        chunks = snapshot.index.search(query, top_k=self.retrieval_top_k)
+        if chunks:
+            background = "\n\n".join(chunk["text"] for chunk in chunks)
+            return system_prompt, f"## Relevant Background:\n{background}", version
+
+        # Nothing matched lexically; don't risk answering without the background
+        work_experience = normalize_text(snapshot.get("work_experience.txt"))
+        context = f"## Detailed Work Experience:\n{work_experience}" if work_experience else None
+        return system_prompt, context, version
+
+    async def summarize_turns(self, previous_summary, turns):
+        """Fold older conversation turns into the rolling summary used by the compactor"""
+        transcript = "\n".join(f"{item['role']}: {item['content']}" for item in turns)
+        prompt = "Update the running summary of a conversation between a website visitor and an assistant. " \
+            "Keep names, email addresses, companies and open questions; drop pleasantries. Reply with the summary only."
+        if previous_summary:
+            prompt += f"\n\nCurrent summary:\n{previous_summary}"
+        prompt += f"\n\nNew turns:\n{transcript}"
+        response = await self.llm.create(
+            model=self.summary_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=300
+        )
+        return (response.choices[0].message.content or "").strip()
+
+    def fast_answer(self, message, start):
+        """Templated answer for a confidently recognised FAQ question, or None"""
+        if self.router is None:
+            return None
+        with span("intent_route"):
+            routed = self.router.route(message, self.profile.snapshot)
+        if routed is None:
+            return None
+        intent, answer = routed
+        self.record_turn("fast_path", message, answer, start, intent=intent)
+        return answer
+
+    def record_turn(self, route, message, reply, start, stats=None, intent=None, outcome="ok"):
+        """Count a finished turn in the metrics and the analytics store"""
+        latency = time.perf_counter() - start
+        metrics.record_route(route, latency, intent=intent)
+        analytics.record_turn(route, message, reply, latency, stats=stats, intent=intent, outcome=outcome)
+        log = turn_log.get()
+        if log is not None:
+            log.append({"route": route, "intent": intent, "outcome": outcome, "latency": latency, **(stats or {})})
+
+    async def chat(self, message, history):
+        start = time.perf_counter()
+        answer = self.fast_answer(message, start)
+        if answer is not None:
+            return answer
+
+        version = self.profile.snapshot.version
+        cached = self.cache.get(message, history, version)
+        if cached is not None:
+            self.record_turn("cache", message, cached, start)
+            return cached
+
+        stats = new_chat_stats()
+        response_text, outcome = None, "error"
+        try:
+            response_text = await self.run_chat(message, history, stats)
+            outcome = "ok"
+        except UpstreamUnavailable as e:
+            response_text, outcome = self.unavailable_reply(e), "unavailable"
+            return response_text
+        finally:
+            metrics.record_usage(stats)
+            self.record_turn("llm", message, response_text, start, stats=stats, outcome=outcome)
+        # Turns that triggered tools (e.g. recording an email) must run every time
+        if not stats["tool_calls"]:
+            self.cache.put(message, history, version, response_text, time.perf_counter() - start,
+                           stats["prompt_tokens"] + stats["completion_tokens"])
+        return response_text
+
+    async def chat_stream(self, message, history):
+        """Streaming counterpart of chat(), served from the fast path or response cache when possible"""
+        start = time.perf_counter()
+        answer = self.fast_answer(message, start)
+        if answer is not None:
+            yield answer
+            return
+
+        version = self.profile.snapshot.version
+        cached = self.cache.get(message, history, version)
+        if cached is not None:
+            self.record_turn("cache", message, cached, start)
+            yield cached
+            return
+
+        stats = new_chat_stats()
+        parts = []
+        outcome = "error"
+        try:
+            async for delta in self.run_chat_stream(message, history, stats):
+                parts.append(delta)
+                yield delta
+            outcome = "ok"
+        except UpstreamUnavailable as e:
+            reply = self.unavailable_reply(e)
+            parts.append(f"\n\n{reply}" if parts else reply)
+            outcome = "unavailable"
+            yield parts[-1]
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away mid-answer
+            outcome = "cancelled"
+            raise
+        finally:
+            metrics.record_usage(stats)
+            self.record_turn("llm", message, "".join(parts), start, stats=stats, outcome=outcome)
+        if not stats["tool_calls"]:
+            self.cache.put(message, history, version, "".join(parts), time.perf_counter() - start,
+                           stats["prompt_tokens"] + stats["completion_tokens"])
+
+    def unavailable_reply(self, error):
+        """Canned answer used while OpenAI is unreachable; never cached"""
+        print(f"⚠️ Upstream unavailable, sending canned reply: {error}", flush=True)
+        metrics.canned_replies_total.inc()
+        contact = f"by email at {self.contact_email}" if self.contact_email else "by email"
+        return f"Sorry, I can't answer right now because my assistant is temporarily unavailable. " \
+            f"Please reach me directly {contact} and I'll get back to you as soon as I can."
+
+    async def build_messages(self, message, history, stats=None):
+        with span("prompt_build"):
+            system_prompt, context, version = self.system_prompt(message, history)
+        if stats is not None:
+            stats["prompt_version"] = version
+        with span("compaction"):
+            return await self.compactor.build_messages(system_prompt, history, message, context)
+
+    def cache_options(self, stats):
+        """Extra create() arguments for provider-side prompt caching"""
+        if not self.prompt_cache_key or not stats["prompt_version"]:
+            return {}
+        return {"prompt_cache_key": f"profile-{stats['prompt_version']}"}
+
+    async def run_chat(self, message, history, stats):
+        messages = await self.build_messages(message, history, stats)
+        done = False
+        max_iterations = 10
+        iterations = 0
+        
+        while not done and iterations < max_iterations:
+            iterations += 1
+            stats["rounds"] += 1
+            with span("llm_round"):
+                response = await self.llm.create(
+                    messages=messages,
+                    tools=tools,
+                    temperature=0.7,
+                    **self.cache_options(stats)
+                )
+            if response.usage:
+                add_usage(stats, response.usage)
+            
+            if response.choices[0].finish_reason == "tool_calls":
+                message_obj = response.choices[0].message
+                tool_calls = message_obj.tool_calls
+                stats["tool_calls"] += len(tool_calls)
+                if self.dispatch_side_effects(message_obj.content, tool_calls):
+                    return message_obj.content
+                results = await self.handle_tool_call(tool_calls)
+                messages.append(tool_call_message(message_obj.content, tool_calls))
+                messages.extend(results)
+            else:
+                done = True
+        
+        if not done:
+            metrics.max_iterations_total.inc()
+            raise Exception("Maximum iterations reached")
+            
+        return response.choices[0].message.content
+
+    async def run_chat_stream(self, message, history, stats):
+        """Same loop as run_chat(), but yields the final assistant turn token by token.
+
+        Every round is requested with stream=True. Tool calls are accumulated and resolved
+        through handle_tool_call, unless the round already carried the reply and only called
+        side-effect-only tools, in which case they are dispatched and the turn ends.
+
+        A round's content is forwarded as it arrives when that round can't be followed by
+        another one: with single-response tools on and every tool side-effect-only, a round
+        with reply text always ends the turn. Otherwise the text is held until finish_reason
+        shows the round ends the turn, so the caller gets the same reply as from run_chat().
+        """
+        messages = await self.build_messages(message, history, stats)
+        max_iterations = 10
+        live = self.single_response_tools and registry.all_side_effect_only()
+
+        for _ in range(max_iterations):
+            stats["rounds"] += 1
+            with span("llm_round"):
+                stream = await self.llm.stream(
+                    messages=messages,
+                    tools=tools,
+                    temperature=0.7,
+                    stream_options={"include_usage": True},
+                    **self.cache_options(stats)
+                )
+
+                tool_call_parts = {}
+                finish_reason = None
+                content = []
+                sent = 0
+                async for chunk in stream:
+                    if chunk.usage:
+                        add_usage(stats, chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    delta = choice.delta
+                    if delta.content:
+                        content.append(delta.content)
+                        # Whitespace alone doesn't count as a reply, so it's held back like the rest
+                        if live and "".join(content).strip():
+                            for part in content[sent:]:
+                                yield part
+                            sent = len(content)
+                    for part in delta.tool_calls or []:
+                        entry = tool_call_parts.setdefault(part.index, {"id": "", "name": "", "arguments": ""})
+                        if part.id:
+                            entry["id"] = part.id
+                        if part.function and part.function.name:
+                            entry["name"] += part.function.name
+                        if part.function and part.function.arguments:
+                            entry["arguments"] += part.function.arguments
+                    if choice.finish_reason:
+                        finish_reason = choice.finish_reason
+
+            if finish_reason != "tool_calls":
+                for part in content[sent:]:
+                    yield part
+                return
+
+            tool_calls = [
+                SimpleNamespace(
+                    id=entry["id"],
+                    type="function",
+                    function=SimpleNamespace(name=entry["name"], arguments=entry["arguments"] or "{}")
+                )
+                for _, entry in sorted(tool_call_parts.items())
+            ]
+            stats["tool_calls"] += len(tool_calls)
+            if self.dispatch_side_effects("".join(content), tool_calls):
+                for part in content[sent:]:
+                    yield part
+                return
+            results = await self.handle_tool_call(tool_calls)
+            messages.append(tool_call_message("".join(content) or None, tool_calls))
+            messages.extend(results)
+
+        metrics.max_iterations_total.inc()
+        raise Exception("Maximum iterations reached")
+
+# Built at startup by warm_up(), or before fork by gunicorn.conf.py when running
+# several workers; get_me_instance() still builds it on demand otherwise.
+me = None
+
+def get_me_instance():
+    global me
+    if me is None:
+        me = Me()
+    return me
+
+# Other people's profiles served by this process; off unless TENANTS_DIR is set
+tenants = TenantRegistry(
+    os.getenv("TENANTS_DIR") or None,
+    build=lambda tenant: Me(tenant, shared=get_me_instance()),
+    max_resident=int(os.getenv("TENANT_MAX_RESIDENT", "32")),
+    revalidate_interval=float(os.getenv("PROFILE_WATCH_INTERVAL", "5"))
+)
+
+async def get_tenant_instance(tenant_id=None):
+    """The Me for a tenant id, loaded on first use; None or "default" is the site owner's.
+    Raises UnknownTenant for ids that aren't hosted here."""
+    if not tenant_id or tenant_id == DEFAULT_TENANT:
+        return get_me_instance()
+    return await tenants.get(tenant_id)
+
+def clean_history(history):
+    """Keep only well-formed user/assistant turns from a client-supplied history"""
+    return [
+        {"role": item["role"], "content": item["content"]}
+        for item in history
+        if isinstance(item, dict) and item.get("role") in ("user", "assistant") and isinstance(item.get("content"), str)
+    ]
+
+async def warm_up():
+    """Build the profile state and open upstream connections before serving traffic.
+
+    Returns the Me instance, or None when it can't be built (e.g. no API key).
+    """
+    try:
+        me_instance = get_me_instance()
+    except ValueError as e:
+        print(f"Warning: chatbot not initialized: {e}")
+        return None
+    if me_instance.watch_interval > 0:
+        me_instance.profile.watch(me_instance.watch_interval)
+
+    with span("warmup"):
+        # Loads the tokenizer and touches the retrieval index and prompt for this process
+        await me_instance.build_messages("Hello", [])
+        if os.getenv("WARMUP_OPENAI", "1").lower() in ("1", "true", "yes"):
+            try:
+                # Free endpoint; establishes the TLS connection the first chat will reuse
+                await asyncio.wait_for(me_instance.openai.models.list(), 10)
+            except Exception as e:
+                print(f"Warning: OpenAI warmup request failed: {type(e).__name__}: {e}")
+    return me_instance
+
+async def close():
+    """Flush notifications and analytics and close the shared HTTP clients"""
+    # Tool calls still running in the background may queue notifications and analytics rows
+    await registry.drain()
+    await notifications.stop()
+    await analytics.stop()
+    if http_client is not None:
+        await http_client.aclose()
+    if me is not None:
+        await me.openai.close()
@@ -0,0 +1,318 @@
+"""Fast path for FAQ-style questions.
+
+A handful of questions ("where did you study?", "how do I contact you?",
+"where do you work?") have short, factual answers that are already in the
+profile files. The router scores each message against example phrasings of
+those intents (TF-IDF cosine plus keyword hints) and, when it is confident,
+answers from a template filled with facts extracted from the profile.
+Confident means both a high score and that the intent's vocabulary covers
+most of the message: "what is your current salary?" shares "current" with
+the current-role intent but asks about something no template answers. Every
+other message, and anything the router is unsure about, goes to the LLM.
+"""
+import math
+import re
+from collections import Counter, OrderedDict
+
+from .retrieval import TOKEN_RE
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+URL_RE = re.compile(r"https?://\S+")
+DEGREE_RE = re.compile(r"\b(B\.?\s?Tech|M\.?\s?Tech|B\.?E\b|B\.?Sc|M\.?Sc|MBA|Ph\.?D|Bachelor|Master)[^\n]*", re.I)
+YEARS_RE = re.compile(r"\b(19|20)\d{2}\s*[-–]\s*(19|20)\d{2}\b")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Unlike retrieval, question words carry the intent here ("where", "how", "who")
+STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does for i if in is it me my of on or please s so
+the to was were would you your
+""".split())
+
+# The site owner's resume, then the names a hosted tenant's resume can have (see chatbot.tenants)
+RESUME_SOURCES = ("shreyresume.docx", "resume.docx", "resume.pdf", "resume.txt")
+
+# Stands in for any company named in the profile, so one example covers them all
+COMPANY_TOKEN = "orgname"
+
+
+def stem(token):
+    for suffix in ("ing", "ied", "ies", "ed", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)] + ("y" if suffix in ("ied", "ies") else "")
+    return token
+
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def first_sentences(text, count):
+    return " ".join(SENTENCE_RE.split(text.strip())[:count])
+
+
+def extract_facts(documents):
+    """Pull the templated facts out of the profile documents; missing facts stay None"""
+    summary = documents.get("summary.txt", "")
+    resume = next((documents[name] for name in RESUME_SOURCES if documents.get(name)), "")
+    experience = documents.get("work_experience.txt", "")
+    facts = {"email": None, "linkedin": None, "education": None, "location": None, "companies": []}
+
+    email = EMAIL_RE.search(resume) or EMAIL_RE.search(summary)
+    if email:
+        facts["email"] = email.group(0)
+    for url in URL_RE.findall(resume):
+        if "linkedin.com" in url:
+            facts["linkedin"] = url.rstrip(".,|")
+
+    lines = [line.strip() for line in resume.splitlines()]
+    for i, line in enumerate(lines):
+        degree = DEGREE_RE.search(line)
+        if not degree:
+            continue
+        # The institution and years sit on the line above the degree
+        previous = next((lines[j] for j in range(i - 1, -1, -1) if lines[j]), "")
+        years = YEARS_RE.search(previous)
+        institution = YEARS_RE.sub("", previous).strip(" \t|,")
+        if institution:
+            facts["education"] = {
+                "degree": degree.group(0).strip().replace(" - ", " in ", 1),
+                "institution": institution,
+                "years": years.group(0) if years else None,
+            }
+        break
+
+    for sentence in SENTENCE_RE.split(summary):
+        if re.search(r"\b(living in|live in|based in)\b", sentence, re.I):
+            facts["location"] = sentence.strip()
+            break
+
+    # work_experience.txt: one "## Company" section per employer, most recent first
+    for section in re.split(r"^##\s+", experience, flags=re.M)[1:]:
+        name, _, body = section.partition("\n")
+        paragraphs = [p.strip() for p in body.split("\n\n") if p.strip()]
+        if name.strip() and paragraphs:
+            facts["companies"].append({"name": name.strip(), "paragraphs": paragraphs})
+    return facts
+
+
+def answer_contact(facts, company):
+    if not facts["email"]:
+        return None
+    answer = f"You can reach me by email at {facts['email']}"
+    if facts["linkedin"]:
+        answer += f" or connect with me on LinkedIn: {facts['linkedin']}"
+    return answer + ". If you like, leave your email here and I'll get back to you."
+
+
+def answer_education(facts, company):
+    education = facts["education"]
+    if not education:
+        return None
+    years = f" ({education['years']})" if education["years"] else ""
+    return f"I studied at {education['institution']}{years}, where I did my {education['degree']}."
+
+
+def answer_location(facts, company):
+    return facts["location"]
+
+
+def answer_current_role(facts, company):
+    if not facts["companies"]:
+        return None
+    # What the role is, then the team it's with
+    return " ".join(first_sentences(paragraph, 1) for paragraph in facts["companies"][0]["paragraphs"][:2])
+
+
+def answer_companies(facts, company):
+    names = [entry["name"] for entry in facts["companies"]]
+    if not names:
+        return None
+    history = names[0] if len(names) == 1 else ", ".join(names[:-1]) + f" and {names[-1]}"
+    return f"I've worked at {history}; I'm currently at {names[0]}. " \
+        "Ask me about any of them and I'll tell you more about what I did there."
+
+
+def answer_company(facts, company):
+    for entry in facts["companies"]:
+        if company and entry["name"].lower() == company.lower():
+            return entry["paragraphs"][0]
+    return None
+
+
+INTENTS = [
+    {
+        "name": "contact",
+        "examples": [
+            "how can I contact you", "how do I reach you", "what is your email", "what's your email address",
+            "how to get in touch", "how can I get in touch with you", "contact details", "can I have your linkedin",
+            "how can I connect with you", "best way to reach you",
+        ],
+        "keywords": {"contact", "email", "reach", "linkedin", "touch", "connect"},
+        "exclude": set(),
+        "answer": answer_contact,
+    },
+    {
+        "name": "education",
+        "examples": [
+            "where did you study", "what is your education", "which college did you go to", "what degree do you have",
+            "where did you go to university", "what did you study in college", "educational background",
+            "what is your alma mater", "where did you graduate from", "which university did you attend",
+        ],
+        "keywords": {"study", "college", "university", "degree", "education", "educational", "graduate", "alma"},
+        "exclude": set(),
+        "answer": answer_education,
+    },
+    {
+        "name": "location",
+        "examples": [
+            "where are you based", "where do you live", "which city are you in", "where are you located",
+            "where do you live now", "what city do you live in", "where are you from", "where are you originally from",
+            "what is your hometown",
+        ],
+        "keywords": {"based", "live", "located", "location", "city", "hometown", "originally"},
+        "exclude": set(),
+        "answer": answer_location,
+    },
+    {
+        "name": "current_role",
+        "examples": [
+            "what is your current role", "where do you work", "what is your job", "what's your current position",
+            "who do you work for", "what is your title", "where do you currently work", "what do you do for work",
+            "what do you do for a living",
+        ],
+        "keywords": {"current", "currently", "job", "role", "position", "title"},
+        "exclude": {"outside", "hobbies", "free", "fun", "weekend", "besides", "previous", "before", "past"},
+        "answer": answer_current_role,
+    },
+    {
+        "name": "companies",
+        "examples": [
+            "which companies have you worked for", "where have you worked", "what companies have you worked at",
+            "what is your work history", "list your previous employers", "what is your career history",
+            "which companies have you been with",
+        ],
+        "keywords": {"companies", "employer", "history", "before", "previous", "past"},
+        "exclude": set(),
+        "answer": answer_companies,
+    },
+    {
+        "name": "company",
+        "examples": [
+            f"what did you do at {COMPANY_TOKEN}", f"tell me about your work at {COMPANY_TOKEN}",
+            f"what was your role at {COMPANY_TOKEN}", f"what do you do at {COMPANY_TOKEN}",
+            f"what is your role at {COMPANY_TOKEN}", f"tell me about {COMPANY_TOKEN}",
+            f"your experience at {COMPANY_TOKEN}",
+        ],
+        "keywords": set(),
+        "exclude": set(),
+        "requires_company": True,
+        "answer": answer_company,
+    },
+]
+
+
+class IntentRouter:
+    def __init__(self, threshold=0.6, intents=INTENTS, keyword_boost=0.15, max_message_chars=160, max_profiles=256,
+                 min_coverage=0.75):
+        """
+        threshold: minimum score to answer from a template instead of the LLM
+        keyword_boost: added to the TF-IDF score when the message contains one of the intent's keywords
+            and is covered by the intent's vocabulary
+        max_profiles: profile versions whose extracted facts are kept (one router serves every tenant)
+        min_coverage: share of the message's token weight that must be words the intent's examples
+            or keywords use, so a single shared word can't select a template
+        """
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.intents = intents
+        self.keyword_boost = keyword_boost
+        self.max_message_chars = max_message_chars
+        self.stats = {"hits": 0, "misses": 0, "intents": Counter()}
+        self.max_profiles = max_profiles
+        self._facts = OrderedDict()
+
+        self.keywords = {intent["name"]: {stem(word) for word in intent["keywords"]} for intent in intents}
+        self.exclude = {intent["name"]: {stem(word) for word in intent["exclude"]} for intent in intents}
+        examples = [(intent, tokenize(text)) for intent in intents for text in intent["examples"]]
+        self.vocabulary = {intent["name"]: set(self.keywords[intent["name"]]) for intent in intents}
+        for intent, tokens in examples:
+            self.vocabulary[intent["name"]].update(tokens)
+        df = Counter(token for _, tokens in examples for token in set(tokens))
+        self.idf = {token: math.log(1 + len(examples) / count) for token, count in df.items()}
+        # Words no example uses get the highest weight, so an off-topic question
+        # ("what technologies do you work with") isn't matched on "what ... work" alone
+        self.unknown_idf = math.log(1 + len(examples))
+        self.examples = [(intent, self._vector(tokens)) for intent, tokens in examples]
+
+    def _vector(self, tokens):
+        counts = Counter(tokens)
+        vector = {token: count * self.idf.get(token, self.unknown_idf) for token, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {token: weight / norm for token, weight in vector.items()} if norm else {}
+
+    def facts(self, snapshot):
+        facts = self._facts.get(snapshot.version)
+        if facts is None:
+            facts = self._facts[snapshot.version] = extract_facts(snapshot.documents)
+            while len(self._facts) > self.max_profiles:
+                self._facts.popitem(last=False)
+        else:
+            self._facts.move_to_end(snapshot.version)
+        return facts
+
+    def coverage(self, tokens, intent):
+        """Share of the message's IDF weight on words the intent's examples or keywords use"""
+        vocabulary = self.vocabulary[intent["name"]]
+        weights = [(token, self.idf.get(token, self.unknown_idf)) for token in tokens]
+        total = sum(weight for _, weight in weights)
+        return sum(weight for token, weight in weights if token in vocabulary) / total if total else 0.0
+
+    def classify(self, message, facts):
+        """Return (intent, score, company, coverage) for the best-scoring intent"""
+        text = message.lower()
+        company = None
+        for entry in facts["companies"]:
+            if re.search(rf"\b{re.escape(entry['name'].lower())}\b", text):
+                company = entry["name"]
+                text = re.sub(rf"\b{re.escape(entry['name'].lower())}\b", COMPANY_TOKEN, text)
+        tokens = tokenize(text)
+        vector = self._vector(tokens)
+        token_set = set(tokens)
+
+        scores = {}
+        for intent, example in self.examples:
+            score = sum(weight * example.get(token, 0.0) for token, weight in vector.items())
+            scores[intent["name"]] = max(scores.get(intent["name"], 0.0), score)
+
+        best, best_score, best_coverage = None, 0.0, 0.0
+        for intent in self.intents:
+            score = scores.get(intent["name"], 0.0)
+            # Templates about the owner don't answer questions about a named company ("where is Quantum located?")
+            if bool(intent.get("requires_company")) != bool(company):
+                continue
+            if token_set & self.exclude[intent["name"]]:
+                continue
+            coverage = self.coverage(tokens, intent)
+            # A keyword confirms a message the intent already covers; it can't carry one that it doesn't
+            if token_set & self.keywords[intent["name"]] and coverage >= self.min_coverage:
+                score += self.keyword_boost
+            if score > best_score:
+                best, best_score, best_coverage = intent, score, coverage
+        return best, min(best_score, 1.0), company, best_coverage
+
+    def route(self, message, snapshot):
+        """Return (intent name, answer) for a confident FAQ match, otherwise None"""
+        if len(message) > self.max_message_chars or EMAIL_RE.search(message):
+            # Long or multi-part questions need the model; email addresses must reach the tools
+            self.stats["misses"] += 1
+            return None
+        facts = self.facts(snapshot)
+        intent, score, company, coverage = self.classify(message, facts)
+        confident = intent and score >= self.threshold and coverage >= self.min_coverage
+        answer = intent["answer"](facts, company) if confident else None
+        if not answer:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.stats["intents"][intent["name"]] += 1
+        return intent["name"], answer
@@ -0,0 +1,222 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain dicts guarded by nothing more
+than the GIL, so recording a value costs a dict lookup and an addition.
+`span(stage)` times a block into the `chat_stage_seconds` histogram and,
+when CHAT_TRACE_LOG is set, into a per-request trace that is printed as
+one JSON line when the request finishes.
+"""
+import bisect
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+TRACE_LOG = os.getenv("CHAT_TRACE_LOG", "").lower() in ("1", "true", "yes")
+
+_current_trace = contextvars.ContextVar("chat_trace", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Mirror a total that is tracked elsewhere (e.g. cache statistics)"""
+        self.values[_label_key(labels)] = value
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, key, None, value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key, {"le": bound}, cumulative
+            yield f"{self.name}_bucket", key, {"le": "+Inf"}, count
+            yield f"{self.name}_sum", key, None, total
+            yield f"{self.name}_count", key, None, count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help):
+        return self._add(Counter(name, help))
+
+    def gauge(self, name, help):
+        return self._add(Gauge(name, help))
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, buckets))
+
+    def on_collect(self, fn):
+        """Register a callback that refreshes gauges right before exposition"""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Warning: metrics collector failed: {e}")
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram("chat_stage_seconds", "Time spent per chat pipeline stage")
+request_seconds = registry.histogram("chat_request_seconds", "End-to-end chat request latency")
+requests_total = registry.counter("chat_requests_total", "Chat requests by endpoint and outcome")
+tokens_total = registry.counter("chat_tokens_total", "OpenAI tokens used, by kind")
+request_tokens = registry.histogram(
+    "chat_request_tokens", "Total OpenAI tokens per chat request",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000)
+)
+llm_rounds = registry.histogram(
+    "chat_llm_rounds", "LLM round trips per chat request",
+    buckets=(1, 2, 3, 4, 5, 10)
+)
+max_iterations_total = registry.counter("chat_max_iterations_total", "Chat loops aborted at max_iterations")
+tool_calls_total = registry.counter("chat_tool_calls_total", "Tool calls by tool name")
+upstream_requests_total = registry.counter("chat_upstream_requests_total", "OpenAI attempts by model and outcome")
+upstream_hedges_total = registry.counter("chat_upstream_hedges_total", "Hedged duplicate OpenAI requests sent")
+upstream_fallbacks_total = registry.counter("chat_upstream_fallbacks_total", "Retries sent to the fallback model")
+circuit_open = registry.gauge("chat_upstream_circuit_open", "1 while the OpenAI circuit breaker is open")
+route_total = registry.counter("chat_route_total", "Chat turns by route (fast_path, cache, llm) and fast-path intent")
+route_seconds = registry.histogram("chat_route_seconds", "Time to answer a chat turn, by route")
+prompt_cache_requests = registry.counter(
+    "chat_prompt_cache_requests_total", "Chat requests by whether OpenAI served part of the prompt from its prefix cache"
+)
+tool_turns_total = registry.counter(
+    "chat_tool_turns_total",
+    "Model responses with tool calls, by whether the reply came in the same response (single_response) or took another round (extra_round)"
+)
+canned_replies_total = registry.counter("chat_canned_replies_total", "Replies served without the model because upstream was unavailable")
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a block into chat_stage_seconds (and the current request trace, if tracing)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace["spans"].append({"stage": stage, **labels, "ms": round(elapsed * 1000, 2)})
+
+
+@contextmanager
+def request_trace(endpoint):
+    """Time a whole request and count its outcome; prints the span trace when CHAT_TRACE_LOG is on"""
+    trace = {"endpoint": endpoint, "spans": []} if TRACE_LOG else None
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield trace
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A streaming generator can be closed from another context after a disconnect
+            pass
+        request_seconds.observe(elapsed, endpoint=endpoint)
+        requests_total.inc(endpoint=endpoint, outcome=outcome)
+        if trace is not None:
+            trace["ms"] = round(elapsed * 1000, 2)
+            trace["outcome"] = outcome
+            print(json.dumps(trace), flush=True)
+
+
+def record_usage(stats):
+    """Record the per-request counters gathered by the chat loop"""
+    tokens_total.inc(stats["prompt_tokens"], kind="prompt")
+    tokens_total.inc(stats["completion_tokens"], kind="completion")
+    tokens_total.inc(stats["cached_tokens"], kind="cached_prompt")
+    request_tokens.observe(stats["prompt_tokens"] + stats["completion_tokens"])
+    llm_rounds.observe(stats["rounds"])
+    if stats["rounds"]:
+        prompt_cache_requests.inc(result="hit" if stats["cached_tokens"] else "miss")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["usage"] = {key: stats[key] for key in ("prompt_tokens", "cached_tokens", "completion_tokens", "rounds")}
+        trace["prompt_version"] = stats["prompt_version"]
+
+
+def record_route(route, seconds, intent=None):
+    """Count a chat turn under the route that answered it"""
+    if intent:
+        route_total.inc(route=route, intent=intent)
+    else:
+        route_total.inc(route=route)
+    route_seconds.observe(seconds, route=route)
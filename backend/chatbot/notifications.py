@@ -0,0 +1,157 @@
+"""Background delivery queue for Pushover notifications.
+
+Tool calls enqueue a message and return immediately; a single worker task
+coalesces whatever arrived within a short window into one push, retries
+failed deliveries with exponential backoff, and keeps every undelivered
+message in a local spool file so it survives a restart.
+"""
+import asyncio
+import json
+import os
+import random
+import uuid
+from pathlib import Path
+
+# Pushover rejects messages longer than this
+MAX_MESSAGE_LENGTH = 1024
+BATCH_SEPARATOR = "\n\n---\n\n"
+
+
+class NotificationQueue:
+    def __init__(self, send, spool_path, batch_window=2.0, base_delay=1.0, max_delay=300.0):
+        """
+        send: coroutine function taking the message text; must raise on failure
+        spool_path: JSONL file holding undelivered notifications
+        batch_window: seconds to wait for more notifications before sending
+        """
+        self.send = send
+        self.spool_path = Path(spool_path)
+        self.batch_window = batch_window
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.pending = []
+        self.wakeup = None
+        self.worker = None
+
+    def start(self):
+        """Load spooled notifications and start the delivery worker on the running loop"""
+        self.pending = self._load_spool()
+        if self.pending:
+            print(f"📬 Loaded {len(self.pending)} undelivered notification(s) from {self.spool_path}")
+        self.wakeup = asyncio.Event()
+        if self.pending:
+            self.wakeup.set()
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=5.0):
+        """Give the worker a last chance to flush, then leave the rest in the spool"""
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        self.worker = None
+
+        async def flush():
+            while self.pending:
+                await self._deliver(self._next_batch())
+
+        try:
+            await asyncio.wait_for(flush(), timeout)
+        except Exception as e:
+            print(f"Pushover notification failed on shutdown: {e}")
+        self._write_spool()
+
+    def enqueue(self, text):
+        """Queue a notification without waiting for delivery"""
+        item = {"id": uuid.uuid4().hex, "message": text}
+        self.pending.append(item)
+        try:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(item) + "\n")
+        except OSError as e:
+            print(f"Warning: could not spool notification: {e}")
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def _run(self):
+        failures = 0
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            if not self.pending:
+                continue
+
+            # Let closely spaced notifications pile up so they go out as one push
+            if failures == 0:
+                await asyncio.sleep(self.batch_window)
+
+            batch = self._next_batch()
+            try:
+                await self._deliver(batch)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+                print(f"Pushover notification failed (attempt {failures}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+            if self.pending:
+                self.wakeup.set()
+
+    def _next_batch(self):
+        """Take as many pending notifications as fit into a single Pushover message"""
+        batch = [self.pending[0]]
+        length = len(self.pending[0]["message"])
+        for item in self.pending[1:]:
+            length += len(BATCH_SEPARATOR) + len(item["message"])
+            if length > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(item)
+        return batch
+
+    async def _deliver(self, batch):
+        await self.send(BATCH_SEPARATOR.join(item["message"] for item in batch))
+        delivered = {item["id"] for item in batch}
+        self.pending = [item for item in self.pending if item["id"] not in delivered]
+        self._write_spool()
+
+    def _load_spool(self):
+        if not self.spool_path.exists():
+            return []
+        items = []
+        try:
+            with open(self.spool_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        items.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A crash mid-write can leave a truncated last line
+                        continue
+        except OSError as e:
+            print(f"Warning: could not read notification spool: {e}")
+        return items
+
+    def _write_spool(self):
+        """Rewrite the spool so it holds exactly the undelivered notifications"""
+        try:
+            if not self.pending:
+                if self.spool_path.exists():
+                    self.spool_path.unlink()
+                return
+            tmp_path = self.spool_path.with_suffix(self.spool_path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for item in self.pending:
+                    f.write(json.dumps(item) + "\n")
+            os.replace(tmp_path, self.spool_path)
+        except OSError as e:
+            print(f"Warning: could not update notification spool: {e}")
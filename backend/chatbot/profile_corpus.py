@@ -0,0 +1,185 @@
+"""Profile corpus loader with an on-disk extraction cache.
+
+Text is extracted from the `me/` sources (plain text, DOCX, PDF) once and
+stored in a small JSON cache keyed by each file's size, mtime and content
+hash, so later cold starts never have to parse DOCX/PDF again. The loaded
+corpus is exposed as an immutable snapshot that also carries the prebuilt
+system prompt; a polling watcher swaps in a fresh snapshot when a source
+file changes.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from .metrics import span
+
+CACHE_FORMAT = 1
+
+
+class ProfileSnapshot:
+    """Immutable view of the profile documents and the prompt and index built from them.
+
+    version hashes the source files; prompt_version hashes the prompt actually sent, so it
+    also changes when the prompt template does, and is equal wherever the bytes are equal.
+    """
+    __slots__ = ("documents", "version", "system_prompt", "prompt_version", "index")
+
+    def __init__(self, documents, version, system_prompt, index=None):
+        object.__setattr__(self, "documents", documents)
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "system_prompt", system_prompt)
+        object.__setattr__(self, "prompt_version", hashlib.sha256(system_prompt.encode()).hexdigest()[:16])
+        object.__setattr__(self, "index", index)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ProfileSnapshot is immutable")
+
+    def get(self, name, default=""):
+        return self.documents.get(name) or default
+
+
+def extract_text(path):
+    """Extract plain text from a .txt, .docx or .pdf file"""
+    suffix = path.suffix.lower()
+    if suffix == ".docx":
+        from docx import Document  # python-docx library, only needed on a cache miss
+        doc = Document(path)
+        return "\n".join([paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()])
+    if suffix == ".pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        return "".join(page.extract_text() or "" for page in reader.pages)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ProfileCorpus:
+    def __init__(self, me_dir, sources, cache_path, build_prompt, build_index=None):
+        """
+        me_dir: directory holding the profile sources
+        sources: file names inside me_dir to load
+        cache_path: JSON file used to persist extracted text between runs
+        build_prompt: callable(documents) -> system prompt string
+        build_index: optional callable(documents) -> retrieval index stored on the snapshot
+        """
+        self.me_dir = Path(me_dir)
+        self.sources = list(sources)
+        self.cache_path = Path(cache_path)
+        self.build_prompt = build_prompt
+        self.build_index = build_index
+        self.snapshot = None
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def load(self):
+        """(Re)load the corpus, using cached text for unchanged files"""
+        with self._lock, span("profile_load"):
+            cache = self._read_cache()
+            entries = {}
+            stats = {}
+            cache_dirty = False
+
+            for name in self.sources:
+                path = self.me_dir / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    print(f"Warning: {path} not found.")
+                    stats[name] = None
+                    continue
+                stats[name] = (stat.st_size, stat.st_mtime_ns)
+
+                cached = cache.get(name)
+                if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+                    entries[name] = cached
+                    continue
+
+                # Stat changed: only re-extract if the bytes actually changed
+                sha256 = file_sha256(path)
+                if cached and cached["sha256"] == sha256:
+                    entry = dict(cached, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                else:
+                    try:
+                        text = extract_text(path)
+                    except Exception as e:
+                        print(f"Warning: Could not load {name}: {e}")
+                        continue
+                    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256, "text": text}
+                    print(f"✅ Extracted {name} ({len(text)} characters)")
+                entries[name] = entry
+                cache_dirty = True
+
+            if cache_dirty or set(entries) != set(cache):
+                self._write_cache(entries)
+
+            documents = {name: entry["text"] for name, entry in entries.items()}
+            version = hashlib.sha256(
+                "".join(f"{name}:{entry['sha256']};" for name, entry in sorted(entries.items())).encode()
+            ).hexdigest()[:16]
+            index = self.build_index(documents) if self.build_index else None
+            self.snapshot = ProfileSnapshot(documents, version, self.build_prompt(documents), index)
+            self._stats = stats
+            return self.snapshot
+
+    def changed(self):
+        """Cheap check whether any source file was modified since the last load"""
+        for name in self.sources:
+            try:
+                stat = (self.me_dir / name).stat()
+                current = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                current = None
+            if current != self._stats.get(name):
+                return True
+        return False
+
+    def watch(self, interval=5.0):
+        """Poll the source files in a daemon thread and reload when they change"""
+        # A forked worker inherits the thread object but not the thread itself
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.changed():
+                        snapshot = self.load()
+                        print(f"🔄 Reloaded profile corpus (version {snapshot.version}, prompt version {snapshot.prompt_version})", flush=True)
+                except Exception as e:
+                    print(f"Warning: profile reload failed: {e}", flush=True)
+
+        self._watcher = threading.Thread(target=run, name="profile-watcher", daemon=True)
+        self._watcher.start()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if data.get("format") != CACHE_FORMAT:
+            return {}
+        return data.get("files", {})
+
+    def _write_cache(self, entries):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"format": CACHE_FORMAT, "files": entries}, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: could not write profile cache: {e}")
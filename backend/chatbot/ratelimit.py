@@ -0,0 +1,171 @@
+"""Admission control for the public chat endpoints.
+
+Two independent guards:
+  - token buckets per client IP and per session, so one client can't burn
+    the OpenAI quota for everybody else
+  - a cap on chat requests in flight in this process, so overload is
+    answered immediately instead of queueing indefinitely
+
+Bucket state lives in a pluggable store. The in-memory store is per
+process; the SQLite store is shared by every worker on the host, which
+keeps limits correct when running several gunicorn workers.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .sqlitedb import ForkSafeConnection
+
+
+class Overloaded(Exception):
+    """Raised when the in-flight cap is reached"""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many chats in progress")
+        self.retry_after = retry_after
+
+
+def refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class InMemoryBucketStore:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+
+    async def take(self, key, rate, burst):
+        """Take one token; returns 0 if allowed, otherwise seconds until a token is available"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = refill(tokens, updated, now, rate, burst)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / rate
+
+
+class SQLiteBucketStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.connection = ForkSafeConnection(path, setup=self._setup, timeout=1.0)
+        self.connection.get()
+
+    @staticmethod
+    def _setup(db):
+        db.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    @property
+    def db(self):
+        return self.connection.get()
+
+    async def take(self, key, rate, burst):
+        # SQLite may wait on another worker's write lock; keep that off the event loop
+        return await asyncio.to_thread(self._take, key, rate, burst)
+
+    def _take(self, key, rate, burst):
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = refill(row[0], row[1], now, rate, burst) if row else burst
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.db.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+                # Drop buckets idle long enough to be full again
+                self.writes += 1
+                if self.writes % 1000 == 0:
+                    self.db.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return 0 if allowed else (1 - tokens) / rate
+
+
+class RateLimiter:
+    def __init__(self, store, ip_rate, ip_burst, session_rate, session_burst):
+        """Rates are tokens per second; bursts are bucket sizes. A rate of 0 disables that limit."""
+        self.store = store
+        self.ip_limit = (ip_rate, ip_burst)
+        self.session_limit = (session_rate, session_burst)
+        self.rejected = 0
+
+    async def check(self, client_ip, session_id=None):
+        """Return 0 if the request may proceed, otherwise the Retry-After in whole seconds"""
+        waits = []
+        if self.ip_limit[0] > 0 and client_ip:
+            waits.append(await self.store.take(f"ip:{client_ip}", *self.ip_limit))
+        if self.session_limit[0] > 0 and session_id:
+            waits.append(await self.store.take(f"session:{session_id}", *self.session_limit))
+        wait = max(waits, default=0)
+        if wait:
+            self.rejected += 1
+            return max(1, math.ceil(wait))
+        return 0
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_in_flight, retry_after=2):
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+
+    def check(self):
+        """Raise Overloaded if no slot is free right now"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise Overloaded(self.retry_after)
+
+    @contextmanager
+    def slot(self, enforce=True):
+        """Hold one in-flight slot for the duration of the block.
+
+        enforce=False takes the slot unconditionally, for callers that checked
+        it without yielding to the event loop since.
+        """
+        if enforce:
+            self.check()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def reserve(self):
+        """Take a slot now and return a function that gives it back (safe to call twice).
+
+        Streaming responses reserve at admission and release when the response
+        ends, so a burst of streams can't all pass the check before any of them
+        has started.
+        """
+        self.check()
+        self.in_flight += 1
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+        return release
+
+
+def create_bucket_store(backend, sqlite_path):
+    if backend == "sqlite":
+        return SQLiteBucketStore(sqlite_path)
+    if backend != "memory":
+        raise ValueError(f"Unknown rate limit store: {backend}")
+    return InMemoryBucketStore()
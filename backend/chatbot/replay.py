@@ -0,0 +1,543 @@
+"""Replay recorded conversations through the chat engine and compare runs.
+
+Conversations are read from a JSONL file, one per line:
+
+    {"id": "s-123", "tenant": "alice", "turns": [{"user": "Hi!", "assistant": "Hello ..."}, ...]}
+
+(`tenant` and the recorded `assistant` replies are optional). `export` writes
+that file from the analytics database. `run` streams it through `Me.chat`
+(or `Me.chat_stream`) with a bounded pool of async workers and appends one
+result line per finished conversation: per-turn route, latency, token usage,
+model rounds and tool calls, and the reply. Each turn is sent with the
+recorded replies as its history where the file has them, so one changed
+answer doesn't change the prompt of every later turn.
+
+The results file is the checkpoint: rerunning the same command skips
+conversations that already have a result, so an interrupted run picks up
+where it stopped. With `--baseline` every conversation is compared with
+an earlier run's results, turn by turn, and the summary reports changed
+answers, routes, latency, tokens and tool calls.
+
+The upstream is a deterministic stub by default, so thousands of
+conversations replay in minutes without an API key; `record` calls the real
+API and keeps every response in a cassette, `playback` serves them back.
+Replayed leads and unknown questions never reach Pushover, the notification
+spool or the analytics database.
+
+    python -m chatbot.replay export --days 7 > conversations.jsonl
+    python -m chatbot.replay run conversations.jsonl --out runs/before.jsonl
+    python -m chatbot.replay run conversations.jsonl --out runs/after.jsonl --baseline runs/before.jsonl
+    python -m chatbot.replay run conversations.jsonl --out runs/live.jsonl --upstream record --cassette runs/cassette.jsonl
+"""
+import argparse
+import asyncio
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from .analytics import DEFAULT_PATH, TENANT_FILTER, current_session, current_tenant
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+
+# Per-turn numbers kept in the results file and summed per conversation
+TURN_TOTALS = ("latency_ms", "prompt_tokens", "cached_tokens", "completion_tokens", "rounds", "tool_calls")
+
+
+def read_jsonl(path):
+    """Parsed lines of a JSONL file; a line cut short by a crash is skipped"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Warning: skipping unreadable line in {path}: {line[:80]}", file=sys.stderr)
+
+
+def latest_results(path):
+    """The last result per conversation id in a results file, keyed by the id as a string"""
+    if not path or not os.path.exists(path):
+        return {}
+    return {str(record["id"]): record for record in read_jsonl(path) if "id" in record}
+
+
+def normalize(text):
+    return " ".join((text or "").split())
+
+
+def word_diff(old, new):
+    """Inline word diff: [-removed-]{+added+}"""
+    old_words, new_words = normalize(old).split(" "), normalize(new).split(" ")
+    parts = []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_words, new_words, autojunk=False).get_opcodes():
+        if op == "equal":
+            parts.extend(old_words[i1:i2])
+            continue
+        if i2 > i1:
+            parts.append(f"[-{' '.join(old_words[i1:i2])}-]")
+        if j2 > j1:
+            parts.append(f"{{+{' '.join(new_words[j1:j2])}+}}")
+    return " ".join(parts)
+
+
+def compare(result, baseline):
+    """Turn-by-turn differences between a conversation's result and its baseline result"""
+    turns = []
+    for index, (turn, before) in enumerate(zip(result["turns"], baseline["turns"])):
+        if normalize(turn["reply"]) == normalize(before["reply"]) and turn["route"] == before["route"]:
+            continue
+        similarity = difflib.SequenceMatcher(None, normalize(before["reply"]), normalize(turn["reply"]),
+                                             autojunk=False).ratio()
+        turns.append({"turn": index, "similarity": round(similarity, 3), "route": [before["route"], turn["route"]],
+                      "diff": word_diff(before["reply"], turn["reply"])})
+    return {
+        "changed_turns": len(turns),
+        "compared_turns": min(len(result["turns"]), len(baseline["turns"])),
+        "similarity": min((turn["similarity"] for turn in turns), default=1.0),
+        "turns": turns,
+    }
+
+
+# Upstreams: httpx transports behind the engine's own AsyncOpenAI client
+
+def request_key(request, body):
+    """Cassette key: the endpoint and the request body with its keys sorted"""
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{request.url.path}\n{canonical}".encode()).hexdigest()
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """Deterministic chat completions: the reply depends only on the last user message.
+
+    Prompt tokens are estimated from the request (~4 characters per token), so a
+    change to the prompt shows up in the token totals even though the stub's
+    answers don't change. A user message with an email address gets a
+    record_user_details call together with the reply, like the real model.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        body = json.loads(await request.aread() or b"{}")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.url.path.endswith("/models"):
+            return httpx.Response(200, json={"object": "list", "data": []})
+        return self.respond(body)
+
+    def respond(self, body):
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {}
+        content = (last.get("content") or "") if last.get("role") == "user" else ""
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        reply = f"Stub reply {digest[:8]} to: {normalize(content)[:120]}"
+        tool_calls = []
+        email = EMAIL_RE.search(content)
+        if email and body.get("tools"):
+            arguments = json.dumps({"email": email.group(0), "notes": content[:200]})
+            tool_calls = [{"id": f"call_{digest[:12]}", "type": "function",
+                           "function": {"name": "record_user_details", "arguments": arguments}}]
+        prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(reply) // 4,
+                 "total_tokens": prompt_tokens + len(reply) // 4, "prompt_tokens_details": {"cached_tokens": 0}}
+        model = body.get("model", "stub")
+        finish_reason = "tool_calls" if tool_calls else "stop"
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": reply}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return httpx.Response(200, json={
+                "id": f"chatcmpl-{digest[:12]}", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}], "usage": usage,
+            })
+
+        base = {"id": f"chatcmpl-{digest[:12]}", "object": "chat.completion.chunk", "created": 0, "model": model}
+        deltas = [{"role": "assistant", "content": reply}]
+        deltas += [{"tool_calls": [dict(call, index=i)]} for i, call in enumerate(tool_calls)]
+        frames = [dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}]) for delta in deltas]
+        frames.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": finish_reason}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            frames.append(dict(base, choices=[], usage=usage))
+        events = "".join(f"data: {json.dumps(frame)}\n\n" for frame in frames) + "data: [DONE]\n\n"
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events.encode())
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Serves upstream responses from a JSONL cassette keyed by request.
+
+    With `upstream` (record mode) requests that aren't in the cassette go to the
+    real API and their responses are appended; without it (playback) they are
+    answered by `fallback` and counted as misses. `replay_latency` sleeps for the
+    recorded response time before answering from the cassette.
+    """
+
+    def __init__(self, path, upstream=None, fallback=None, replay_latency=False):
+        self.path = Path(path)
+        self.upstream = upstream
+        self.fallback = fallback
+        self.replay_latency = replay_latency
+        self.entries = {}
+        if self.path.exists():
+            for entry in read_jsonl(self.path):
+                self.entries[entry["key"]] = entry
+        self.stats = Counter()
+
+    async def handle_async_request(self, request):
+        body = json.loads(await request.aread() or b"{}")
+        key = request_key(request, body)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.stats["hits"] += 1
+            if self.replay_latency:
+                await asyncio.sleep(entry["latency"])
+            return httpx.Response(entry["status"], headers={"content-type": entry["content_type"]},
+                                  content=entry["body"].encode())
+        if self.upstream is None:
+            self.stats["misses"] += 1
+            return self.fallback.respond(body)
+
+        start = time.perf_counter()
+        response = await self.upstream.handle_async_request(request)
+        try:
+            # Decoded (gzip/brotli) body, so the content-encoding header isn't kept
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        entry = {"key": key, "status": response.status_code,
+                 "content_type": response.headers.get("content-type", "application/json"),
+                 "body": content.decode(), "latency": round(time.perf_counter() - start, 4)}
+        self.stats["recorded"] += 1
+        # Failed responses are passed on but not kept, so a later run asks again
+        if response.status_code < 400:
+            self.entries[key] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return httpx.Response(entry["status"], headers={"content-type": entry["content_type"]}, content=content)
+
+
+def build_transport(args):
+    stub = StubTransport(latency=args.stub_latency)
+    if args.upstream == "stub":
+        return stub
+    if args.upstream == "playback":
+        return CassetteTransport(args.cassette, fallback=stub, replay_latency=args.replay_latency)
+    return CassetteTransport(args.cassette, upstream=httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=args.workers, max_keepalive_connections=args.workers)
+    ))
+
+
+# The runner
+
+async def replay_conversation(engine, conversation, stream):
+    """Play one conversation turn by turn; returns its result record"""
+    me = await engine.get_tenant_instance(conversation.get("tenant"))
+    current_session.set(str(conversation["id"]))
+    current_tenant.set(me.tenant_id)
+    history, turns = [], []
+    for turn in conversation.get("turns", []):
+        log = []
+        engine.turn_log.set(log)
+        if stream:
+            reply = "".join([delta async for delta in me.chat_stream(turn["user"], history)])
+        else:
+            reply = await me.chat(turn["user"], history)
+        stats = log[-1] if log else {}
+        turns.append({
+            "user": turn["user"],
+            "reply": reply,
+            "route": stats.get("route"),
+            "intent": stats.get("intent"),
+            "outcome": stats.get("outcome"),
+            "latency_ms": round(stats.get("latency", 0) * 1000, 2),
+            **{name: stats.get(name, 0) for name in TURN_TOTALS[1:]},
+        })
+        recorded = turn.get("assistant")
+        history += [{"role": "user", "content": turn["user"]},
+                    {"role": "assistant", "content": reply if recorded is None else recorded}]
+    result = {"id": conversation["id"], "tenant": me.tenant_id, "turns": turns}
+    result.update({name: round(sum(turn[name] for turn in turns), 2) for name in TURN_TOTALS})
+    return result
+
+
+async def run(args):
+    if args.upstream != "record":
+        os.environ.setdefault("OPENAI_API_KEY", "replay")
+    from openai import AsyncOpenAI
+
+    from . import engine
+    from .notifications import NotificationQueue
+
+    async def discard(text):
+        pass
+
+    # Never started, so replayed leads and unknown questions are only counted
+    engine.notifications = NotificationQueue(discard, spool_path=os.devnull)
+    engine.analytics.enabled = False
+
+    # Set on the instances rather than in os.environ: importing the engine loads .env with override=True
+    def configure(instance):
+        instance.watch_interval = 0
+        if not args.response_cache:
+            instance.cache.max_entries = 0
+        return instance
+
+    build = engine.tenants.build
+    engine.tenants.build = lambda tenant: configure(build(tenant))
+    engine.tenants.revalidate_interval = 0
+
+    transport = build_transport(args)
+    client = AsyncOpenAI(
+        api_key=os.environ["OPENAI_API_KEY"],
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(60, connect=10))
+    )
+    # Tenants built later share the default instance's client
+    me = configure(engine.get_me_instance())
+    await me.openai.close()
+    me.openai = me.llm.client = client
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    finished = {key for key, record in latest_results(out).items() if "error" not in record}
+    if out.exists() and out.stat().st_size:
+        with open(out, "rb+") as f:
+            # A line cut short by a crash would run into the next result
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    baseline = latest_results(args.baseline)
+    if finished:
+        print(f"⏩ Resuming: {len(finished)} conversation(s) already in {out}")
+
+    queue = asyncio.Queue(maxsize=args.workers * 2)
+    progress = Counter()
+    start = time.perf_counter()
+
+    async def worker(f):
+        while True:
+            conversation = await queue.get()
+            if conversation is None:
+                return
+            try:
+                result = await asyncio.wait_for(replay_conversation(engine, conversation, args.stream), args.timeout)
+            except Exception as e:
+                result = {"id": conversation["id"], "tenant": conversation.get("tenant"),
+                          "error": f"{type(e).__name__}: {e}", "turns": []}
+                progress["errors"] += 1
+            before = baseline.get(str(result["id"]))
+            if before is not None and "error" not in result and "error" not in before:
+                result["diff"] = compare(result, before)
+                progress["changed"] += bool(result["diff"]["changed_turns"])
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+            progress["done"] += 1
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.progress)
+            elapsed = time.perf_counter() - start
+            print(f"… {progress['done']} replayed ({progress['done'] / elapsed:.1f}/s), {progress['errors']} errors, "
+                  f"{progress['changed']} changed", flush=True)
+
+    with open(out, "a", encoding="utf-8") as f:
+        workers = [asyncio.create_task(worker(f)) for _ in range(args.workers)]
+        reporter = asyncio.create_task(report()) if args.progress > 0 else None
+        try:
+            for conversation in read_jsonl(args.conversations):
+                if "id" not in conversation or str(conversation["id"]) in finished:
+                    progress["skipped"] += "id" in conversation
+                    continue
+                finished.add(str(conversation["id"]))
+                if args.limit and progress["queued"] >= args.limit:
+                    break
+                progress["queued"] += 1
+                await queue.put(conversation)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            for task in workers:
+                task.cancel()
+            elapsed = time.perf_counter() - start
+            await engine.close()
+
+    summary = summarize(latest_results(out), baseline)
+    summary["run"] = {
+        "replayed": progress["done"], "skipped": progress["skipped"], "errors": progress["errors"],
+        "seconds": round(elapsed, 1), "conversations_per_second": round(progress["done"] / elapsed, 1) if elapsed else 0,
+        "workers": args.workers, "upstream": args.upstream, "upstream_requests": getattr(transport, "requests", None),
+        "cassette": dict(transport.stats) if isinstance(transport, CassetteTransport) else None,
+        "notifications_suppressed": len(engine.notifications.pending),
+    }
+    return summary
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+
+def totals(records):
+    turns = [turn for record in records for turn in record["turns"]]
+    latencies = [turn["latency_ms"] for turn in turns]
+    return {
+        "conversations": len(records),
+        "turns": len(turns),
+        "routes": dict(Counter(turn["route"] for turn in turns)),
+        "outcomes": dict(Counter(turn["outcome"] for turn in turns)),
+        "turn_latency_ms": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+                            "p99": percentile(latencies, 0.99), "max": max(latencies, default=None)},
+        "conversation_latency_ms_p50": percentile([record["latency_ms"] for record in records], 0.5),
+        **{name: sum(turn[name] for turn in turns) for name in TURN_TOTALS[1:]},
+    }
+
+
+def summarize(results, baseline):
+    """Totals over a results file and, with a baseline, the same over the conversations both runs replayed"""
+    ok = [record for record in results.values() if "error" not in record]
+    summary = {"errors": len(results) - len(ok), **totals(ok)}
+    if not baseline:
+        return summary
+    pairs = [(record, baseline[key]) for key, record in results.items()
+             if "error" not in record and key in baseline and "error" not in baseline[key]]
+    diffs = [record.get("diff") or compare(record, before) for record, before in pairs]
+    changed = [(record["id"], turn) for (record, _), diff in zip(pairs, diffs) for turn in diff["turns"]]
+    summary["baseline"] = {
+        "compared_conversations": len(pairs),
+        "changed_conversations": sum(1 for diff in diffs if diff["changed_turns"]),
+        "compared_turns": sum(diff["compared_turns"] for diff in diffs),
+        "changed_turns": len(changed),
+        "route_changes": dict(Counter(f"{turn['route'][0]}->{turn['route'][1]}" for _, turn in changed
+                                      if turn["route"][0] != turn["route"][1])),
+        "before": totals([before for _, before in pairs]),
+        "after": totals([record for record, _ in pairs]),
+        "most_changed": [{"id": key, **turn} for key, turn in sorted(changed, key=lambda item: item[1]["similarity"])[:20]],
+    }
+    return summary
+
+
+def print_summary(summary, show):
+    run = summary.get("run", {})
+    if run:
+        print(f"replayed {run['replayed']} conversation(s) in {run['seconds']} s ({run['conversations_per_second']}/s, "
+              f"{run['workers']} workers, {run['upstream']} upstream), {run['skipped']} already done, "
+              f"{run['errors']} failed, {run['notifications_suppressed']} notification(s) not sent")
+        if run.get("cassette"):
+            print(f"cassette: {run['cassette']}")
+
+    def block(label, entry):
+        latency = entry["turn_latency_ms"]
+        print(f"{label:<10}{entry['conversations']:>7} conv {entry['turns']:>8} turns  "
+              f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms")
+        print(f"{'':<10}tokens: {entry['prompt_tokens']} prompt ({entry['cached_tokens']} cached), "
+              f"{entry['completion_tokens']} completion; {entry['rounds']} rounds, {entry['tool_calls']} tool calls")
+        print(f"{'':<10}routes: {entry['routes']}  outcomes: {entry['outcomes']}")
+
+    block("results", summary)
+    compared = summary.get("baseline")
+    if not compared:
+        return
+    print(f"\nbaseline: {compared['changed_conversations']} of {compared['compared_conversations']} conversations and "
+          f"{compared['changed_turns']} of {compared['compared_turns']} turns changed; route changes: {compared['route_changes']}")
+    block("before", compared["before"])
+    block("after", compared["after"])
+    for entry in compared["most_changed"][:show]:
+        route = entry["route"][0] if entry["route"][0] == entry["route"][1] else " -> ".join(map(str, entry["route"]))
+        print(f"\n{entry['id']} turn {entry['turn']} (similarity {entry['similarity']}, {route}):\n  {entry['diff'][:600]}")
+
+
+def export(args):
+    """Write the conversations in the analytics database as replay input, one per session"""
+    if not os.path.exists(args.db):
+        sys.exit(f"{args.db} does not exist yet")
+    db = sqlite3.connect(args.db)
+    since = time.time() - args.days * 86400 if args.days else 0
+    rows = db.execute(
+        "SELECT session, COALESCE(tenant, 'default'), message, reply FROM turns "
+        "WHERE session IS NOT NULL AND message IS NOT NULL AND ts >= ?" + TENANT_FILTER
+        + " ORDER BY COALESCE(tenant, 'default'), session, ts, id",
+        (since, args.tenant, args.tenant)
+    )
+    key, conversation, count = None, None, 0
+
+    def emit():
+        sys.stdout.write(json.dumps(conversation, ensure_ascii=False) + "\n")
+
+    for session, tenant, message, reply in rows:
+        if (tenant, session) != key:
+            if conversation is not None:
+                emit()
+                count += 1
+            key = (tenant, session)
+            conversation = {"id": session} if tenant == "default" else {"id": f"{tenant}:{session}", "tenant": tenant}
+            conversation["turns"] = []
+        conversation["turns"].append({"user": message, "assistant": reply})
+    if conversation is not None:
+        emit()
+        count += 1
+    print(f"Exported {count} conversation(s)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded conversations through the chat engine")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    exporter = commands.add_parser("export", help="write conversations from the analytics database as JSONL")
+    exporter.add_argument("--db", default=os.getenv("ANALYTICS_DB_PATH", str(DEFAULT_PATH)))
+    exporter.add_argument("--days", type=float, default=7, help="only the last N days (0 for everything)")
+    exporter.add_argument("--tenant", help="only one hosted profile (\"default\" is the site owner's)")
+
+    runner = commands.add_parser("run", help="replay a conversations file")
+    runner.add_argument("conversations", help="JSONL file of conversations")
+    runner.add_argument("--out", required=True, help="results JSONL; also the checkpoint an interrupted run resumes from")
+    runner.add_argument("--baseline", help="results of an earlier run to compare answers, tokens and latency with")
+    runner.add_argument("--workers", type=int, default=32, help="conversations replayed at once")
+    runner.add_argument("--upstream", choices=["stub", "record", "playback"], default="stub")
+    runner.add_argument("--cassette", help="JSONL of recorded upstream responses (record / playback)")
+    runner.add_argument("--stub-latency", type=float, default=0.0, help="seconds the stub waits per request")
+    runner.add_argument("--replay-latency", action="store_true", help="playback waits as long as the recorded response took")
+    runner.add_argument("--stream", action="store_true", help="use chat_stream instead of chat")
+    runner.add_argument("--response-cache", action="store_true", help="keep the response cache on (off by default)")
+    runner.add_argument("--timeout", type=float, default=300, help="seconds per conversation before it counts as failed")
+    runner.add_argument("--limit", type=int, default=0, help="replay at most N new conversations")
+    runner.add_argument("--progress", type=float, default=10, help="seconds between progress lines (0 for none)")
+    runner.add_argument("--show", type=int, default=5, help="changed turns to print")
+    runner.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args)
+        return
+    if args.upstream != "stub" and not args.cassette:
+        parser.error(f"--upstream {args.upstream} needs --cassette")
+    if args.upstream == "playback" and not os.path.exists(args.cassette):
+        parser.error(f"{args.cassette} does not exist")
+    summary = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary, args.show)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Resilient calls to the OpenAI chat completions API.
+
+Every upstream call goes through ResilientChat, which adds:
+  - a deadline per attempt (for streams: until the first chunk, then per chunk)
+  - retries with jittered exponential backoff on transient errors only
+  - an optional hedged second request when the first is slower than a threshold
+  - a fallback model for retries, and for every call for a while after the
+    primary model failed
+  - a circuit breaker that fails fast while upstream is down
+
+When the breaker is open or every attempt failed, UpstreamUnavailable is
+raised and the caller answers with a canned reply instead of an error.
+"""
+import asyncio
+import random
+import time
+
+import openai
+
+from .metrics import circuit_open, upstream_fallbacks_total, upstream_hedges_total, upstream_requests_total
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the circuit is open or every attempt to reach the model failed"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        failure_threshold: consecutive failed calls that open the circuit
+        reset_timeout: seconds to stay open before letting one trial call through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print("✅ Upstream circuit closed", flush=True)
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        circuit_open.set(0)
+
+    def release_trial(self):
+        """The call allowed in half-open state ended without a verdict (e.g. it was cancelled);
+        let the next call be the trial instead"""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"⚠️ Upstream circuit opened after {self.failures} failed calls", flush=True)
+            self.opened_at = time.monotonic()
+            circuit_open.set(1)
+
+
+class ResilientChat:
+    def __init__(self, client, model, fallback_model=None, timeout=30.0, retries=2,
+                 base_delay=0.5, max_delay=4.0, hedge_after=0.0, fallback_cooldown=30.0, breaker=None):
+        """
+        client: AsyncOpenAI instance (create it with max_retries=0; retries happen here)
+        model: default model for create()/stream()
+        fallback_model: model used for retries after the default model failed, and for
+            all calls during fallback_cooldown seconds after that
+        timeout: seconds per attempt; for streams, until the first chunk and between chunks
+        hedge_after: seconds before a second identical request is raced; 0 disables hedging
+        """
+        self.client = client
+        self.model = model
+        self.fallback_model = fallback_model
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.fallback_cooldown = fallback_cooldown
+        self.degraded_until = 0.0
+        self.breaker = breaker or CircuitBreaker()
+
+    async def create(self, **kwargs):
+        """chat.completions.create with deadlines, retries, hedging and fallback"""
+        return await self._call(self._complete, kwargs)
+
+    async def stream(self, **kwargs):
+        """Open a streaming completion and return an async iterator over its chunks.
+
+        Retries, hedging and fallback cover everything up to the first chunk;
+        after that a stalled stream raises UpstreamUnavailable.
+        """
+        stream, iterator, first = await self._call(self._open_stream, kwargs)
+        return self._iterate(stream, iterator, first)
+
+    async def _complete(self, model, kwargs):
+        return await self.client.chat.completions.create(model=model, **kwargs)
+
+    async def _open_stream(self, model, kwargs):
+        stream = await self.client.chat.completions.create(model=model, stream=True, **kwargs)
+        iterator = stream.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await stream.close()
+            raise
+        return stream, iterator, first
+
+    async def _iterate(self, stream, iterator, first):
+        try:
+            if first is None:
+                return
+            yield first
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                except TRANSIENT_ERRORS as e:
+                    raise UpstreamUnavailable(f"stream interrupted: {type(e).__name__}") from e
+                yield chunk
+        finally:
+            await stream.close()
+
+    async def _call(self, fn, kwargs):
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            raise UpstreamUnavailable("circuit open")
+        kwargs = dict(kwargs)
+        requested = kwargs.pop("model", self.model)
+
+        try:
+            return await self._attempts(fn, requested, kwargs)
+        except BaseException:
+            # Cancelled (client gone, conversation timeout, shutdown): without this a half-open
+            # trial that never finished would keep the circuit refusing every call
+            if trial:
+                self.breaker.release_trial()
+            raise
+
+    async def _attempts(self, fn, requested, kwargs):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            model = requested
+            # Only requests for the default chat model fall back; an explicit other model is kept
+            if self.fallback_model and requested == self.model and (attempt or time.monotonic() < self.degraded_until):
+                model = self.fallback_model
+                upstream_fallbacks_total.inc(model=model)
+            try:
+                result = await self._attempt(fn, model, kwargs)
+            except TRANSIENT_ERRORS as e:
+                last_error = e
+                if model == self.model:
+                    self.degraded_until = time.monotonic() + self.fallback_cooldown
+                outcome = "timeout" if isinstance(e, (asyncio.TimeoutError, openai.APITimeoutError)) else "error"
+                upstream_requests_total.inc(model=model, outcome=outcome)
+                print(f"Warning: {model} attempt {attempt + 1} failed: {type(e).__name__}: {e}", flush=True)
+                if attempt < self.retries:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                    await asyncio.sleep(random.uniform(0, delay))
+                continue
+            except Exception:
+                # Upstream answered; the request itself was rejected
+                upstream_requests_total.inc(model=model, outcome="rejected")
+                self.breaker.record_success()
+                raise
+            upstream_requests_total.inc(model=model, outcome="ok")
+            self.breaker.record_success()
+            return result
+
+        self.breaker.record_failure()
+        raise UpstreamUnavailable(f"{self.retries + 1} attempts failed: {type(last_error).__name__}") from last_error
+
+    async def _attempt(self, fn, model, kwargs):
+        """One deadline-bound attempt, raced against a hedged duplicate if it is slow"""
+        def launch():
+            return asyncio.ensure_future(asyncio.wait_for(fn(model, kwargs), self.timeout))
+
+        if not self.hedge_after:
+            return await launch()
+
+        pending = {launch()}
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if not done:
+                upstream_hedges_total.inc(model=model)
+                pending.add(launch())
+            while True:
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    for extra in winners[1:]:
+                        await self._discard(extra.result())
+                    return winners[0].result()
+                if done:
+                    error = error or next(iter(done)).exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _discard(self, result):
+        # A hedged stream that lost the race still holds an open connection
+        if isinstance(result, tuple):
+            await result[0].close()
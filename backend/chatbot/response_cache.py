@@ -0,0 +1,155 @@
+"""Response cache for repeated visitor questions.
+
+Lookups go through three levels:
+  1. exact match on the normalized message and history
+  2. near-duplicate match (term-vector cosine similarity) for first turns
+     without history, so "What do you do at Quantum?" and "so what do you
+     do at quantum" share an answer; both must use the same question
+     words and negations, so "When did you leave?" never gets the answer
+     to "Why did you leave?"
+  3. TTL expiry plus LRU eviction bound the size and staleness
+
+Entries are tied to the profile corpus version and dropped when it changes.
+"""
+import hashlib
+import json
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+
+from .intents import tokenize
+
+# Words that change what is being asked; near-duplicates must agree on them ("why did you leave" is
+# not "when did you leave"). "t" is what is left of "n't" after tokenizing.
+QUESTION_WORDS = frozenset("what why when where who whom whose which how".split())
+NEGATIONS = frozenset("not no never nor t".split())
+
+PUNCTUATION_RE = re.compile(r"[^\w\s@.]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    text = PUNCTUATION_RE.sub(" ", (text or "").lower())
+    return WHITESPACE_RE.sub(" ", text).strip().rstrip(".")
+
+
+def markers(vector):
+    return frozenset(token for token in vector if token in QUESTION_WORDS or token in NEGATIONS)
+
+
+def cosine(a, b):
+    dot = sum(count * b.get(term, 0) for term, count in a.items())
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(count * count for count in a.values()))
+    norm_b = math.sqrt(sum(count * count for count in b.values()))
+    return dot / (norm_a * norm_b)
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl=3600, fuzzy_threshold=0.9):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fuzzy_threshold = fuzzy_threshold
+        self.entries = OrderedDict()
+        self.version = None
+        self.stats = Counter()
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+
+    def key(self, message, history):
+        if not history:
+            return normalize(message)
+        turns = [(item.get("role"), normalize(item.get("content"))) for item in history]
+        digest = hashlib.sha256(json.dumps(turns).encode()).hexdigest()[:16]
+        return f"{digest}:{normalize(message)}"
+
+    def get(self, message, history, version):
+        """Return a cached response or None"""
+        self._check_version(version)
+        now = time.monotonic()
+        key = self.key(message, history)
+
+        entry = self.entries.get(key)
+        if entry is not None and self._expired(entry, now, key):
+            entry = None
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return self._hit("exact_hits", entry)
+
+        if not history and self.fuzzy_threshold < 1:
+            vector = Counter(tokenize(message))
+            if vector:
+                best, best_score = None, self.fuzzy_threshold
+                for candidate_key, candidate in list(self.entries.items()):
+                    if candidate["vector"] is None or self._expired(candidate, now, candidate_key):
+                        continue
+                    if markers(candidate["vector"]) != markers(vector):
+                        continue
+                    score = cosine(vector, candidate["vector"])
+                    if score >= best_score:
+                        best, best_score = candidate_key, score
+                if best is not None:
+                    self.entries.move_to_end(best)
+                    return self._hit("fuzzy_hits", self.entries[best])
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, message, history, version, response, elapsed, tokens=0):
+        """Store a response; elapsed and tokens are what the uncached call cost"""
+        self._check_version(version)
+        key = self.key(message, history)
+        self.entries[key] = {
+            "response": response,
+            "created": time.monotonic(),
+            "elapsed": elapsed,
+            "tokens": tokens,
+            # Only history-free first turns take part in near-duplicate matching
+            "vector": None if history else Counter(tokenize(message)),
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def snapshot(self):
+        hits = self.stats["exact_hits"] + self.stats["fuzzy_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            "entries": len(self.entries),
+            "exact_hits": self.stats["exact_hits"],
+            "fuzzy_hits": self.stats["fuzzy_hits"],
+            "misses": self.stats["misses"],
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.stats["evictions"],
+            "expirations": self.stats["expirations"],
+            "invalidations": self.stats["invalidations"],
+            "saved_seconds": round(self.saved_seconds, 3),
+            "saved_tokens": self.saved_tokens,
+        }
+
+    def _hit(self, counter, entry):
+        self.stats[counter] += 1
+        self.saved_seconds += entry["elapsed"]
+        self.saved_tokens += entry["tokens"]
+        return entry["response"]
+
+    def _expired(self, entry, now, key):
+        if now - entry["created"] <= self.ttl:
+            return False
+        del self.entries[key]
+        self.stats["expirations"] += 1
+        return True
+
+    def _check_version(self, version):
+        # Profile files changed: every cached answer may be stale
+        if version != self.version:
+            if self.entries:
+                self.stats["invalidations"] += 1
+            self.entries.clear()
+            self.version = version
@@ -0,0 +1,102 @@
+"""Small in-process BM25 index over the profile documents.
+
+Documents are split into heading-aware chunks of a few hundred characters,
+and each chat turn retrieves only the chunks relevant to the visitor's
+question instead of sending every document in full.
+"""
+import math
+import re
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about an and are as at be but by can did do does for from had has have he her his how i if in into is it
+its me my of on or our she so that the their them then there they this to was we were what when where which
+who why will with you your
+""".split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_document(source, text, max_chars=800):
+    """Split a document into chunks, keeping each chunk under its markdown heading"""
+    chunks = []
+    heading = ""
+    buffer = []
+    size = 0
+
+    def flush():
+        nonlocal buffer, size
+        if buffer:
+            body = "\n".join(buffer)
+            chunks.append({"source": source, "heading": heading, "text": f"{heading}\n{body}" if heading else body})
+        buffer = []
+        size = 0
+
+    for paragraph in text.splitlines():
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if paragraph.startswith("#"):
+            flush()
+            heading = paragraph.lstrip("#").strip()
+            continue
+        if size and size + len(paragraph) > max_chars:
+            flush()
+        buffer.append(paragraph)
+        size += len(paragraph)
+    flush()
+    return chunks
+
+
+class BM25Index:
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = []
+        self.lengths = []
+        document_freq = Counter()
+        for chunk in chunks:
+            tokens = tokenize(chunk["text"])
+            counts = Counter(tokens)
+            self.term_freqs.append(counts)
+            self.lengths.append(len(tokens))
+            document_freq.update(counts.keys())
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        total = len(chunks)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_freq.items()
+        }
+
+    def search(self, query, top_k=4):
+        """Return up to top_k chunks ordered by BM25 score; chunks with no overlap are skipped"""
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        if not terms:
+            return []
+        scored = []
+        for i, counts in enumerate(self.term_freqs):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(reverse=True)
+        return [self.chunks[i] for _, i in scored[:top_k]]
+
+
+def build_index(documents, sources, max_chars=800):
+    """Chunk the given documents (name -> text) and index them"""
+    chunks = []
+    for name in sources:
+        text = documents.get(name)
+        if text:
+            chunks.extend(chunk_document(name, text, max_chars=max_chars))
+    return BM25Index(chunks)
@@ -0,0 +1,123 @@
+"""Server-side conversation sessions.
+
+The client sends a session id and only its new message; the conversation
+history lives here. Two stores are available: a bounded in-memory LRU
+(default) and a SQLite file for deployments that want sessions to survive
+restarts or be shared between workers. Both expire sessions after a period
+of inactivity. Store methods are coroutines: the SQLite store runs its
+queries on a thread, so a worker waiting on another worker's write lock
+doesn't stall the event loop.
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from .sqlitedb import ForkSafeConnection
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def bound_history(history, max_turns):
+    """Cap stored turns. Drops down to half the cap at once, so the kept prefix (and any
+    summary cached for it) stays stable for many turns instead of sliding every message."""
+    if len(history) <= max_turns:
+        return history
+    history = history[-(max_turns // 2):]
+    while history and history[0]["role"] != "user":
+        history = history[1:]
+    return history
+
+
+class InMemorySessionStore:
+    def __init__(self, max_sessions=10000, idle_ttl=1800, max_turns=100):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.sessions = OrderedDict()
+
+    async def get(self, session_id):
+        """Return the stored history, or None if the session is unknown or idle-expired"""
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["updated"] > self.idle_ttl:
+            del self.sessions[session_id]
+            return None
+        self.sessions.move_to_end(session_id)
+        return list(entry["history"])
+
+    async def save(self, session_id, history):
+        self.sessions[session_id] = {"history": bound_history(history, self.max_turns), "updated": time.monotonic()}
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    async def count(self):
+        return len(self.sessions)
+
+
+class SQLiteSessionStore:
+    def __init__(self, path, idle_ttl=1800, max_turns=100):
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.path = path
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.connection = ForkSafeConnection(path, setup=self._setup)
+        self.connection.get()
+
+    @staticmethod
+    def _setup(db):
+        db.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, history TEXT NOT NULL, updated REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    @property
+    def db(self):
+        return self.connection.get()
+
+    async def get(self, session_id):
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def save(self, session_id, history):
+        await asyncio.to_thread(self._save, session_id, history)
+
+    async def count(self):
+        return await asyncio.to_thread(self._count)
+
+    def _get(self, session_id):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT history FROM sessions WHERE id = ? AND updated > ?",
+                (session_id, time.time() - self.idle_ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, session_id, history):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO sessions (id, history, updated) VALUES (?, ?, ?)",
+                (session_id, json.dumps(bound_history(history, self.max_turns)), time.time())
+            )
+            # Purge idle sessions every so often instead of on every write
+            self.writes += 1
+            if self.writes % 100 == 0:
+                self.db.execute("DELETE FROM sessions WHERE updated <= ?", (time.time() - self.idle_ttl,))
+
+    def _count(self):
+        with self.lock:
+            # Live sessions only; idle ones wait for the next purge. Served by the updated index
+            return self.db.execute("SELECT COUNT(*) FROM sessions WHERE updated > ?",
+                                   (time.time() - self.idle_ttl,)).fetchone()[0]
+
+
+def create_session_store(backend, idle_ttl, max_sessions, max_turns, sqlite_path):
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, idle_ttl=idle_ttl, max_turns=max_turns)
+    if backend != "memory":
+        raise ValueError(f"Unknown session store: {backend}")
+    return InMemorySessionStore(max_sessions=max_sessions, idle_ttl=idle_ttl, max_turns=max_turns)
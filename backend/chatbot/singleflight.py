@@ -0,0 +1,83 @@
+"""Single-flight deduplication of identical in-flight chat requests.
+
+When several visitors send the same opening question at the same moment,
+only the first request runs the LLM loop; the others wait for it and get
+the same result. The shared work runs in its own task, so a client that
+disconnects does not cancel the call for everybody else.
+"""
+import asyncio
+from collections import Counter
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+        self.stats = Counter()
+
+    async def do(self, key, fn):
+        """Run fn() once per key at a time; concurrent callers with the same key share its result"""
+        task = self.calls.get(key)
+        if task is None:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # Shield so one caller being cancelled doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+
+class StreamFlight:
+    """Like SingleFlight, for async iterators: every caller receives every chunk from the start"""
+
+    def __init__(self):
+        self.streams = {}
+        self.stats = Counter()
+
+    async def stream(self, key, factory):
+        shared = self.streams.get(key)
+        if shared is None:
+            self.stats["leaders"] += 1
+            shared = _SharedStream(factory())
+            self.streams[key] = shared
+            shared.task.add_done_callback(lambda _: self.streams.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        index = 0
+        while True:
+            async with shared.changed:
+                while index >= len(shared.chunks) and not shared.finished:
+                    await shared.changed.wait()
+                chunks = shared.chunks[index:]
+                finished = shared.finished
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+            if finished and index >= len(shared.chunks):
+                break
+        if shared.error is not None:
+            raise shared.error
+
+
+class _SharedStream:
+    def __init__(self, iterator):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(iterator))
+
+    async def _pump(self, iterator):
+        try:
+            async for chunk in iterator:
+                async with self.changed:
+                    self.chunks.append(chunk)
+                    self.changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self.changed:
+                self.finished = True
+                self.changed.notify_all()
@@ -0,0 +1,33 @@
+"""SQLite connections shared by the session, rate-limit and analytics stores.
+
+A connection must not cross fork(): a gunicorn worker forked from a preloaded
+master inherits the master's connection object, and using it from two
+processes corrupts SQLite's locking. `ForkSafeConnection` opens the file
+lazily and opens it again the first time it is used in a new process.
+"""
+import os
+import sqlite3
+
+
+class ForkSafeConnection:
+    def __init__(self, path, setup=None, timeout=5.0):
+        """
+        path: SQLite file, put in WAL mode so several workers can share it
+        setup: called with each new connection, e.g. to create tables
+        timeout: seconds to wait on another connection's write lock
+        """
+        self.path = str(path)
+        self.setup = setup
+        self.timeout = timeout
+        self._db = None
+        self._pid = None
+
+    def get(self):
+        """Return this process's connection, opening it if needed"""
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            if self.setup is not None:
+                self.setup(db)
+            self._db, self._pid = db, os.getpid()
+        return self._db
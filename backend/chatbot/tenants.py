@@ -0,0 +1,162 @@
+"""Many portfolio profiles served from one process.
+
+Each tenant is a directory under TENANTS_DIR named after its id, holding a
+`tenant.json` ({"name": ..., "contact_email": ...}) and the same documents
+as `me/`: summary.txt, work_experience.txt and resume.docx (or resume.pdf /
+resume.txt). A tenant's `Me` is built the first time a request names it,
+on a thread so a cold load doesn't block the event loop, and at most
+`max_resident` of them stay in memory; the least recently used is dropped
+when another one is loaded. Everything that isn't profile-specific (the
+OpenAI client and its connection pool, the circuit breaker, the compactor,
+the intent router) is shared with the site owner's own `Me`.
+
+Resident tenants aren't watched by a thread each; instead a request re-checks
+the tenant's files at most every `revalidate_interval` seconds and reloads
+the corpus when they changed.
+"""
+import asyncio
+import json
+import re
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from .metrics import registry
+
+# The site owner's profile in me/; requests without a tenant are served from it
+DEFAULT_TENANT = "default"
+
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# A tenant's resume is the first of these that exists
+RESUME_FILES = ("resume.docx", "resume.pdf", "resume.txt")
+
+tenant_loads = registry.counter("chat_tenant_loads_total", "Tenant profiles loaded, by result (loaded, reloaded, unknown, failed)")
+tenant_load_seconds = registry.histogram("chat_tenant_load_seconds", "Time to build a tenant on its first request")
+tenant_evictions = registry.counter("chat_tenant_evictions_total", "Tenants dropped from memory to make room for another")
+resident_tenants = registry.gauge("chat_tenants_resident", "Tenant profiles currently held in memory")
+
+
+class UnknownTenant(Exception):
+    """Raised for a tenant id that is malformed or has no profile directory"""
+
+
+class Tenant:
+    """A hosted profile: its id, the name the bot speaks as, and where its documents live"""
+    __slots__ = ("id", "name", "me_dir", "resume", "contact_email")
+
+    def __init__(self, id, name, me_dir, resume, contact_email=None):
+        self.id = id
+        self.name = name
+        self.me_dir = Path(me_dir)
+        self.resume = resume
+        self.contact_email = contact_email
+
+    @classmethod
+    def from_dir(cls, tenant_id, me_dir):
+        """Read `tenant.json` in me_dir; None when it is missing or unreadable"""
+        me_dir = Path(me_dir)
+        try:
+            with open(me_dir / "tenant.json", "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: could not read {me_dir / 'tenant.json'}: {e}")
+            return None
+        if not isinstance(config, dict) or not config.get("name"):
+            print(f"Warning: {me_dir / 'tenant.json'} has no name")
+            return None
+        resume = next((name for name in RESUME_FILES if (me_dir / name).exists()), RESUME_FILES[0])
+        return cls(tenant_id, config["name"], me_dir, resume, config.get("contact_email"))
+
+
+class TenantRegistry:
+    def __init__(self, tenants_dir, build, max_resident=32, revalidate_interval=5.0):
+        """
+        tenants_dir: directory with one subdirectory per tenant; None disables tenants
+        build: callable(Tenant) -> Me, run on a worker thread
+        max_resident: tenants kept in memory at once (least recently used are dropped)
+        revalidate_interval: seconds between checks of a resident tenant's files; 0 never checks
+        """
+        self.tenants_dir = Path(tenants_dir) if tenants_dir else None
+        self.build = build
+        self.max_resident = max(1, max_resident)
+        self.revalidate_interval = revalidate_interval
+        self.resident = OrderedDict()  # tenant id -> [Me, last revalidation]
+        self.loading = {}  # tenant id -> Task building it, shared by concurrent first requests
+        self.stats = Counter()
+
+    def tenant(self, tenant_id):
+        """The Tenant for an id, or None when it isn't hosted here"""
+        if self.tenants_dir is None or not TENANT_ID_RE.match(tenant_id or ""):
+            return None
+        return Tenant.from_dir(tenant_id, self.tenants_dir / tenant_id)
+
+    async def get(self, tenant_id):
+        """Return the tenant's Me, loading it on first use; raises UnknownTenant"""
+        entry = self.resident.get(tenant_id)
+        if entry is not None:
+            self.resident.move_to_end(tenant_id)
+            self.stats["hits"] += 1
+            await self._revalidate(tenant_id, entry)
+            return entry[0]
+
+        task = self.loading.get(tenant_id)
+        if task is None:
+            task = asyncio.create_task(self._load(tenant_id))
+            self.loading[tenant_id] = task
+            task.add_done_callback(lambda _: self.loading.pop(tenant_id, None))
+        # Shielded so a client that disconnects doesn't cancel the load other requests wait on
+        return await asyncio.shield(task)
+
+    async def _load(self, tenant_id):
+        start = time.perf_counter()
+        tenant = await asyncio.to_thread(self.tenant, tenant_id)
+        if tenant is None:
+            self.stats["unknown"] += 1
+            tenant_loads.inc(result="unknown")
+            raise UnknownTenant(tenant_id)
+        try:
+            me = await asyncio.to_thread(self.build, tenant)
+        except Exception:
+            tenant_loads.inc(result="failed")
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats["loads"] += 1
+        tenant_loads.inc(result="loaded")
+        tenant_load_seconds.observe(elapsed)
+
+        self.resident[tenant_id] = [me, time.monotonic()]
+        while len(self.resident) > self.max_resident:
+            evicted, _ = self.resident.popitem(last=False)
+            self.stats["evictions"] += 1
+            tenant_evictions.inc()
+            print(f"Tenant {evicted} evicted ({len(self.resident)} resident)", flush=True)
+        resident_tenants.set(len(self.resident))
+        print(f"✅ Loaded tenant {tenant_id} in {elapsed * 1000:.1f} ms ({len(self.resident)} resident)", flush=True)
+        return me
+
+    async def _revalidate(self, tenant_id, entry):
+        if self.revalidate_interval <= 0 or time.monotonic() - entry[1] < self.revalidate_interval:
+            return
+        entry[1] = time.monotonic()
+        profile = entry[0].profile
+        # A few stat() calls; only a real change pays for re-reading the files
+        if await asyncio.to_thread(profile.changed):
+            snapshot = await asyncio.to_thread(profile.load)
+            self.stats["reloads"] += 1
+            tenant_loads.inc(result="reloaded")
+            print(f"🔄 Reloaded tenant {tenant_id} (version {snapshot.version}, prompt version {snapshot.prompt_version})", flush=True)
+
+    def snapshot(self):
+        return {
+            "enabled": self.tenants_dir is not None,
+            "resident": len(self.resident),
+            "max_resident": self.max_resident,
+            "hits": self.stats["hits"],
+            "loads": self.stats["loads"],
+            "reloads": self.stats["reloads"],
+            "evictions": self.stats["evictions"],
+            "unknown": self.stats["unknown"],
+        }
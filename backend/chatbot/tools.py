@@ -0,0 +1,114 @@
+"""Explicit registry for the functions the model is allowed to call.
+
+Tools are registered together with their OpenAI schema and a timeout.
+Dispatch is a dict lookup instead of `globals().get(name)`, so only
+registered functions can ever be invoked. All tool calls from one model
+turn run concurrently and their results are returned in the order of the
+original tool_call ids.
+
+Tools registered with `side_effect_only=True` only record something and
+return nothing the model needs to read. When the model answers and calls
+only such tools in the same response, `dispatch()` runs them in the
+background and the reply can go out without another model round.
+"""
+import asyncio
+import json
+import time
+
+from .metrics import span, tool_calls_total
+
+
+class ToolRegistry:
+    def __init__(self, default_timeout=5.0, observer=None):
+        """
+        observer: optional callable(name, seconds, outcome) run after every tool call,
+        e.g. to record it in the analytics store
+        """
+        self.default_timeout = default_timeout
+        self.observer = observer
+        self.tools = {}
+        # Background dispatches still running; kept referenced so they aren't garbage collected
+        self.pending = set()
+
+    def register(self, schema, timeout=None, side_effect_only=False):
+        """Decorator registering an async function under schema["name"]"""
+        def decorator(fn):
+            self.tools[schema["name"]] = {
+                "fn": fn,
+                "schema": {"type": "function", "function": schema},
+                "timeout": timeout or self.default_timeout,
+                "side_effect_only": side_effect_only,
+            }
+            return fn
+        return decorator
+
+    def side_effect_only(self, tool_calls):
+        """True when every call is to a registered tool whose result the model doesn't need"""
+        return bool(tool_calls) and all(
+            self.tools.get(call.function.name, {}).get("side_effect_only") for call in tool_calls
+        )
+
+    def all_side_effect_only(self):
+        """True when no registered tool returns anything the model needs to read"""
+        return all(tool["side_effect_only"] for tool in self.tools.values())
+
+    def schemas(self):
+        """Tool definitions in the format expected by chat.completions.create"""
+        return [tool["schema"] for tool in self.tools.values()]
+
+    async def run(self, tool_calls):
+        """Execute one model turn's tool calls concurrently; results keep the tool_calls order"""
+        results = await asyncio.gather(*(self._run_one(tool_call) for tool_call in tool_calls))
+        return [
+            {"role": "tool", "content": json.dumps(result), "tool_call_id": tool_call.id}
+            for tool_call, result in zip(tool_calls, results)
+        ]
+
+    def dispatch(self, tool_calls):
+        """Run tool calls in the background without waiting for (or returning) their results"""
+        task = asyncio.create_task(self.run(tool_calls))
+        self.pending.add(task)
+        task.add_done_callback(self._dispatched)
+
+    def _dispatched(self, task):
+        self.pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Warning: background tool call failed: {task.exception()!r}", flush=True)
+
+    async def drain(self, timeout=10):
+        """Wait for background tool calls to finish, e.g. before shutdown flushes notifications"""
+        if self.pending:
+            await asyncio.wait(list(self.pending), timeout=timeout)
+
+    async def _run_one(self, tool_call):
+        name = tool_call.function.name
+        start = time.perf_counter()
+        result = await self._call(tool_call)
+        if self.observer is not None:
+            error = result.get("error") if isinstance(result, dict) else None
+            outcome = "ok" if error is None else "timeout" if error == "timed out" else "error"
+            self.observer(name, time.perf_counter() - start, outcome)
+        return result
+
+    async def _call(self, tool_call):
+        name = tool_call.function.name
+        tool = self.tools.get(name)
+        print(f"🔧 Tool called: {name}", flush=True)
+        if tool is None:
+            print(f"Warning: model called unknown tool {name}", flush=True)
+            return {"error": f"unknown tool {name}"}
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+        except json.JSONDecodeError:
+            return {"error": "arguments were not valid JSON"}
+
+        tool_calls_total.inc(tool=name)
+        with span("tool_call", tool=name):
+            try:
+                return await asyncio.wait_for(tool["fn"](**arguments), tool["timeout"])
+            except asyncio.TimeoutError:
+                print(f"Warning: tool {name} timed out after {tool['timeout']}s", flush=True)
+                return {"error": "timed out"}
+            except TypeError as e:
+                # The model passed arguments the function doesn't accept
+                return {"error": str(e)}
@@ -1,18 +1,45 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from typing_extensions import Annotated, TypedDict
 from dotenv import load_dotenv
-from openai import OpenAI
-import json
+import hmac
+import orjson
 import os
-import requests
-from docx import Document  # python-docx library
+import time
 from pathlib import Path
+from chatbot import engine, metrics
+from chatbot.analytics import current_session, current_tenant
+from chatbot.compression import CompressionMiddleware
+from chatbot.engine import analytics, get_tenant_instance, notifications
+from chatbot.ratelimit import ConcurrencyLimiter, Overloaded, RateLimiter, create_bucket_store
+from chatbot.response_cache import ResponseCache
+from chatbot.sessions import create_session_store, new_session_id
+from chatbot.singleflight import SingleFlight, StreamFlight
+from chatbot.tenants import DEFAULT_TENANT, UnknownTenant
 
 load_dotenv(override=True)
 
-app = FastAPI(title="Shrey Chauhan Chatbot API")
+class ORJSONRequest(Request):
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+class ORJSONRoute(APIRoute):
+    """Parses request bodies with orjson; FastAPI otherwise uses the stdlib json module"""
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            return await handler(ORJSONRequest(request.scope, request.receive))
+        return route_handler
+
+app = FastAPI(title="Shrey Chauhan Chatbot API", default_response_class=ORJSONResponse)
+app.router.route_class = ORJSONRoute
 
 # Configure CORS
 app.add_middleware(
@@ -28,219 +55,288 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def push(text):
-    """Send notification via Pushover (optional)"""
-    if os.getenv("PUSHOVER_TOKEN") and os.getenv("PUSHOVER_USER"):
-        try:
-            requests.post(
-                "https://api.pushover.net/1/messages.json",
-                data={
-                    "token": os.getenv("PUSHOVER_TOKEN"),
-                    "user": os.getenv("PUSHOVER_USER"),
-                    "message": text,
-                },
-                timeout=5
-            )
-        except Exception as e:
-            print(f"Pushover notification failed: {e}")
-
-def record_user_details(email, name="Name not provided", notes="not provided"):
-    """Record user contact information"""
-    # Validate email is provided
-    if not email or email.strip() == "":
-        email = "No email provided"
-    
-    # Format a more informative notification
-    notification_parts = [f"📧 New Contact: {email}"]
-    if name and name != "Name not provided" and name.strip():
-        notification_parts.append(f"Name: {name}")
-    if notes and notes != "not provided" and notes.strip():
-        notification_parts.append(f"\n💬 Conversation:\n{notes}")
-    
-    push("\n".join(notification_parts))
-    return {"recorded": "ok"}
-
-def record_unknown_question(question):
-    """Record questions that couldn't be answered"""
-    push(f"Recording unknown question: {question}")
-    return {"recorded": "ok"}
-
-# OpenAI function definitions
-record_user_details_json = {
-    "name": "record_user_details",
-    "description": "Use this tool to record that a user is interested in being in touch and provided an email address. Always include the user's message or a summary of the conversation in the notes field.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "email": {"type": "string", "description": "The email address of this user"},
-            "name": {"type": "string", "description": "The user's name, if they provided it. Use 'Name not provided' if the user didn't share their name."},
-            "notes": {"type": "string", "description": "The user's message or a brief summary of what they discussed. This should include the conversation context or the reason they're reaching out."}
-        },
-        "required": ["email"],
-        "additionalProperties": False
-    }
-}
-
-record_unknown_question_json = {
-    "name": "record_unknown_question",
-    "description": "Always use this tool to record any question that couldn't be answered as you didn't know the answer",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "question": {"type": "string", "description": "The question that couldn't be answered"}
-        },
-        "required": ["question"],
-    }
-}
-
-tools = [
-    {"type": "function", "function": record_user_details_json},
-    {"type": "function", "function": record_unknown_question_json}
-]
-
-class Me:
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it in Railway Variables.")
-        self.openai = OpenAI(api_key=api_key)
-        self.name = "Shrey Chauhan"
-        
-        # Get project root directory (parent of backend/)
-        project_root = Path(__file__).parent.parent
-        me_dir = project_root / "me"
-        
-        # Load summary
-        summary_path = me_dir / "summary.txt"
-        try:
-            with open(summary_path, "r", encoding="utf-8") as f:
-                self.summary = f.read().strip()
-            print(f"✅ Loaded profile summary ({len(self.summary)} characters)")
-        except FileNotFoundError:
-            print("Warning: me/summary.txt not found. Using default summary.")
-            self.summary = "Shrey Chauhan is a Senior Engineering Manager at Quantum, where he leads the Unified Surveillance Platform (USP) engineering team."
-        
-        # Load resume from DOCX
-        self.resume = ""
-        resume_path = me_dir / "shreyresume.docx"
-        try:
-            doc = Document(resume_path)
-            self.resume = "\n".join([paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()])
-            print(f"✅ Loaded resume from DOCX ({len(self.resume)} characters)")
-        except FileNotFoundError:
-            print(f"Warning: {resume_path} not found.")
-        except Exception as e:
-            print(f"Warning: Could not load resume from DOCX: {e}")
-        
-        # Load work experience details
-        work_experience_path = me_dir / "work_experience.txt"
-        try:
-            with open(work_experience_path, "r", encoding="utf-8") as f:
-                self.work_experience = f.read().strip()
-            print(f"✅ Loaded work experience details ({len(self.work_experience)} characters)")
-        except FileNotFoundError:
-            print("Warning: me/work_experience.txt not found. Work experience details will not be available.")
-            self.work_experience = ""
-        except Exception as e:
-            print(f"Warning: Could not load work experience: {e}")
-            self.work_experience = ""
-
-    def handle_tool_call(self, tool_calls):
-        results = []
-        for tool_call in tool_calls:
-            tool_name = tool_call.function.name
-            arguments = json.loads(tool_call.function.arguments)
-            print(f" these are the arguments: {arguments}")
-            print(f"🔧 Tool called: {tool_name}", flush=True)
-            tool = globals().get(tool_name)
-            result = tool(**arguments) if tool else {}
-            results.append({
-                "role": "tool",
-                "content": json.dumps(result),
-                "tool_call_id": tool_call.id
-            })
-            print(results)
-        return results
-    
-    def system_prompt(self):
-        system_prompt = f"""You are acting as {self.name}. You are answering questions on {self.name}'s website, \
-particularly questions related to {self.name}'s career, background, skills and experience. \
-Your responsibility is to represent {self.name} for interactions on the website as faithfully as possible. \
-You are given a summary of {self.name}'s background and resume which you can use to answer questions. \
-Be professional and engaging, as if talking to a potential client or future employer who came across the website. \
-If you don't know the answer to any question, use your record_unknown_question tool to record the question that you couldn't answer, even if it's about something trivial or unrelated to career. \
-If the user is engaging in discussion, try to steer them towards getting in touch via email; ask for their email and record it using your record_user_details tool. \
-When recording user details, always include the user's message or a summary of the conversation in the 'notes' parameter so {self.name} knows what they were interested in."""
-
-        system_prompt += f"\n\n## Summary:\n{self.summary}\n\n## Resume:\n{self.resume}\n\n"
-        
-        # Add work experience if available
-        if hasattr(self, 'work_experience') and self.work_experience:
-            system_prompt += f"## Detailed Work Experience:\n{self.work_experience}\n\n"
-        
-        system_prompt += f"With this context, please chat with the user, always staying in character as {self.name}."
-        return system_prompt
-    
-    def chat(self, message, history):
-        messages = [{"role": "system", "content": self.system_prompt()}] + history + [{"role": "user", "content": message}]
-        done = False
-        max_iterations = 10
-        iterations = 0
-        
-        while not done and iterations < max_iterations:
-            iterations += 1
-            response = self.openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                tools=tools,
-                temperature=0.7
-            )
-            
-            if response.choices[0].finish_reason == "tool_calls":
-                message_obj = response.choices[0].message
-                tool_calls = message_obj.tool_calls
-                print(tool_calls)
-                results = self.handle_tool_call(tool_calls)
-                messages.append(message_obj)
-                messages.extend(results)
-            else:
-                done = True
-        
-        if not done:
-            raise Exception("Maximum iterations reached")
-            
-        return response.choices[0].message.content
-
-# Initialize the chatbot (lazy initialization on first request)
-me = None
-
-def get_me_instance():
-    global me
-    if me is None:
-        me = Me()
-    return me
-
-# Request/Response models
+# gzip, or brotli when installed, for JSON responses and SSE streams alike
+if os.getenv("COMPRESSION", "1").lower() in ("1", "true", "yes"):
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "500")),
+        gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    )
+
+# Conversation history is kept server-side; clients only send their session id
+sessions = create_session_store(
+    os.getenv("SESSION_STORE", "memory"),
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "1800")),
+    max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+    max_turns=int(os.getenv("SESSION_MAX_TURNS", "100")),
+    sqlite_path=os.getenv("SESSION_DB_PATH", str(Path(__file__).parent / "sessions.db"))
+)
+
+# Identical concurrent requests share one upstream LLM loop
+inflight = SingleFlight()
+inflight_streams = StreamFlight()
+
+# Admission control: token buckets per client IP / session, and a cap on chats in flight
+rate_limiter = RateLimiter(
+    create_bucket_store(
+        os.getenv("RATE_LIMIT_STORE", "memory"),
+        sqlite_path=os.getenv("RATE_LIMIT_DB_PATH", str(Path(__file__).parent / "ratelimit.db"))
+    ),
+    ip_rate=float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "20")) / 60,
+    ip_burst=float(os.getenv("RATE_LIMIT_IP_BURST", "10")),
+    session_rate=float(os.getenv("RATE_LIMIT_SESSION_PER_MINUTE", "10")) / 60,
+    session_burst=float(os.getenv("RATE_LIMIT_SESSION_BURST", "5"))
+)
+chat_slots = ConcurrencyLimiter(
+    int(os.getenv("MAX_INFLIGHT_CHATS", "200")),
+    retry_after=int(os.getenv("OVERLOAD_RETRY_AFTER", "2"))
+)
+# Number of reverse proxies in front of the app that append to X-Forwarded-For; 0 uses the peer address
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0").lower()
+TRUSTED_PROXY_HOPS = 1 if TRUST_FORWARDED_FOR in ("true", "yes") else int(TRUST_FORWARDED_FOR or 0)
+
+# Request/Response models; size caps reject oversized bodies before any work is done
+MAX_MESSAGE_CHARS = int(os.getenv("CHAT_MAX_MESSAGE_CHARS", "4000"))
+MAX_HISTORY_ITEMS = int(os.getenv("CHAT_MAX_HISTORY_ITEMS", "100"))
+MAX_HISTORY_ITEM_CHARS = int(os.getenv("CHAT_MAX_HISTORY_ITEM_CHARS", "8000"))
+
+class HistoryItem(TypedDict):
+    # Validated straight into plain dicts (cheaper than a model per turn); other keys are dropped
+    role: Literal["user", "assistant"]
+    content: Annotated[str, Field(max_length=MAX_HISTORY_ITEM_CHARS)]
+
 class ChatRequest(BaseModel):
-    message: str
-    history: list = []
+    message: str = Field(max_length=MAX_MESSAGE_CHARS)
+    session_id: Optional[str] = Field(None, max_length=64)
+    # Which hosted profile to talk to (see TENANTS_DIR); omitted for the site owner's own
+    tenant: Optional[str] = Field(None, max_length=64)
+    # Deprecated: full history from clients that don't use sessions yet
+    history: List[HistoryItem] = Field([], max_length=MAX_HISTORY_ITEMS)
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: str
+
+async def resolve_tenant(request):
+    """The Me that answers this request; 404 for a tenant that isn't hosted here"""
+    try:
+        me_instance = await get_tenant_instance(request.tenant)
+    except UnknownTenant:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    current_tenant.set(me_instance.tenant_id)
+    return me_instance
+
+def session_key(tenant_id, session_id):
+    # A session id is only valid with the profile it was started on
+    return session_id if tenant_id == DEFAULT_TENANT else f"{tenant_id}:{session_id}"
+
+async def resolve_session(request, tenant_id=DEFAULT_TENANT):
+    """Return (session_id, stored history) for a request, starting a new session if needed"""
+    if request.session_id:
+        history = await sessions.get(session_key(tenant_id, request.session_id))
+        if history is not None:
+            return request.session_id, history
+    # Unknown or expired id: start fresh, seeded from a legacy client-sent history if present
+    return new_session_id(), request.history
+
+def client_ip(http_request):
+    if TRUSTED_PROXY_HOPS:
+        # Each trusted proxy appends the address it received the request from; entries to the
+        # left of those come from the client and can be anything
+        forwarded = [hop.strip() for hop in http_request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return http_request.client.host if http_request.client else None
+
+async def admit(http_request, request, reserve=False):
+    """Reject over-limit requests immediately with 429/503 and a Retry-After header.
+
+    With reserve=True the in-flight slot is taken here and the function that releases
+    it is returned; otherwise the caller takes it without yielding to the event loop first.
+    """
+    retry_after = await rate_limiter.check(client_ip(http_request), request.session_id)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many messages, please slow down.",
+                            headers={"Retry-After": str(retry_after)})
+    try:
+        if reserve:
+            return chat_slots.reserve()
+        chat_slots.check()
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail="The assistant is busy, please try again shortly.",
+                            headers={"Retry-After": str(e.retry_after)})
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that gives back a reserved chat slot when it ends, however it ends
+    (finished, failed, or the client went away before the first byte)"""
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+def record_coalesced(message, reply, start):
+    """The engine records the turn of the request that ran; requests that joined it are recorded here"""
+    analytics.record_turn("coalesced", message, reply, time.perf_counter() - start)
+
+async def remember_turn(tenant_id, session_id, history, message, reply):
+    await sessions.save(session_key(tenant_id, session_id), history + [
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": reply}
+    ])
+
+# Set once this worker has warmed up; /ready reports it so traffic only reaches warm workers
+worker_ready = False
+
+@app.on_event("startup")
+async def start_background_tasks():
+    global worker_ready
+    # gunicorn.conf.py gives each worker a stable slot so spools survive worker restarts
+    worker_slot = os.getenv("WORKER_SLOT")
+    if worker_slot and worker_slot != "0":
+        spool = notifications.spool_path
+        notifications.spool_path = spool.with_name(f"{spool.stem}.{worker_slot}{spool.suffix}")
+    notifications.start()
+    analytics.start()
+    me_instance = await engine.warm_up()
+    if me_instance is not None:
+        worker_ready = True
+        print(f"✅ Worker {os.getpid()} ready (profile version {me_instance.profile.snapshot.version})")
+
+@app.on_event("shutdown")
+async def close_clients():
+    global worker_ready
+    worker_ready = False
+    await engine.close()
 
 @app.get("/health")
 def health():
     return {"status": "ok", "name": "Shrey Chauhan Chatbot API"}
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until this worker has warmed up (and again while shutting down)"""
+    if not worker_ready:
+        return ORJSONResponse(status_code=503, content={"status": "starting", "pid": os.getpid()})
+    snapshot = engine.me.profile.snapshot
+    return {"status": "ready", "pid": os.getpid(), "profile_version": snapshot.version,
+            "prompt_version": snapshot.prompt_version}
+
+@app.get("/cache/stats")
+def cache_stats():
+    stats = ResponseCache().snapshot() if engine.me is None else engine.me.cache.snapshot()
+    stats["coalesced_requests"] = inflight.stats["coalesced"] + inflight_streams.stats["coalesced"]
+    stats["tenants"] = engine.tenants.snapshot()
+    if engine.me is not None and engine.me.router is not None:
+        router = engine.me.router.stats
+        routed = router["hits"] + router["misses"]
+        stats["fast_path"] = {
+            "hits": router["hits"],
+            "misses": router["misses"],
+            "hit_rate": round(router["hits"] / routed, 3) if routed else 0.0,
+            "intents": dict(router["intents"]),
+        }
+    return stats
+
+# Reports read visitor messages and contact details, so they are only served with ANALYTICS_TOKEN
+ANALYTICS_TOKEN = os.getenv("ANALYTICS_TOKEN")
+
+def check_analytics_access(http_request):
+    if not ANALYTICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = http_request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ANALYTICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid analytics token")
+
+def since_days(days):
+    return time.time() - days * 86400 if days > 0 else None
+
+@app.get("/analytics/unanswered")
+def analytics_unanswered(http_request: Request, days: float = 7, limit: int = 20, tenant: Optional[str] = None):
+    """Questions the bot couldn't answer, most frequent first"""
+    check_analytics_access(http_request)
+    return analytics.top_unanswered(since_days(days), min(limit, 500), tenant)
+
+@app.get("/analytics/latency")
+def analytics_latency(http_request: Request, days: float = 1, tenant: Optional[str] = None):
+    """Turn latency percentiles per route (fast_path, cache, llm)"""
+    check_analytics_access(http_request)
+    return analytics.latency_distribution(since_days(days), tenant)
+
+@app.get("/analytics/rounds")
+def analytics_rounds(http_request: Request, days: float = 1, tenant: Optional[str] = None):
+    """Model round trips per conversation and per tool-calling turn"""
+    check_analytics_access(http_request)
+    return analytics.round_trips(since_days(days), tenant)
+
+@app.get("/analytics/leads")
+def analytics_leads(http_request: Request, days: float = 30, limit: int = 50, tenant: Optional[str] = None):
+    check_analytics_access(http_request)
+    return analytics.leads(since_days(days), min(limit, 500), tenant)
+
+cache_entries = metrics.registry.gauge("chat_response_cache_entries", "Entries in the response cache")
+cache_lookups = metrics.registry.counter("chat_response_cache_lookups_total", "Response cache lookups by result")
+coalesced_requests = metrics.registry.counter("chat_coalesced_requests_total", "Requests that joined an identical in-flight request")
+pending_notifications = metrics.registry.gauge("chat_pending_notifications", "Notifications waiting for delivery")
+inflight_chats = metrics.registry.gauge("chat_in_flight", "Chat requests currently being processed")
+rejected_requests = metrics.registry.counter("chat_rejected_requests_total", "Requests rejected by admission control")
+active_sessions = metrics.registry.gauge("chat_sessions", "Stored conversation sessions")
+analytics_rows = metrics.registry.gauge("chat_analytics_rows", "Analytics rows by state (buffered, written, dropped)")
+
+@metrics.registry.on_collect
+def collect_state_metrics():
+    if engine.me is not None:
+        cache = engine.me.cache.snapshot()
+        cache_entries.set(cache["entries"])
+        for result in ("exact_hits", "fuzzy_hits", "misses"):
+            cache_lookups.set(cache[result], result=result)
+    coalesced_requests.set(inflight.stats["coalesced"] + inflight_streams.stats["coalesced"])
+    pending_notifications.set(len(notifications.pending))
+    inflight_chats.set(chat_slots.in_flight)
+    rejected_requests.set(rate_limiter.rejected, reason="rate_limit")
+    rejected_requests.set(chat_slots.rejected, reason="overloaded")
+    analytics_rows.set(len(analytics.buffer), state="buffered")
+    analytics_rows.set(analytics.stats["written"], state="written")
+    analytics_rows.set(analytics.stats["dropped"], state="dropped")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Counted here rather than in a collector: the SQLite store's count is a coroutine
+    active_sessions.set(await sessions.count())
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+    await admit(http_request, request)
+
     try:
-        if not request.message:
-            raise HTTPException(status_code=400, detail="Message is required")
-        
-        me_instance = get_me_instance()
-        response_text = me_instance.chat(request.message, request.history)
-        return ChatResponse(response=response_text)
+        with chat_slots.slot(enforce=False), metrics.request_trace("chat"):
+            me_instance = await resolve_tenant(request)
+            session_id, history = await resolve_session(request, me_instance.tenant_id)
+            current_session.set(session_id)
+            start = time.perf_counter()
+            led = []
+
+            def lead():
+                led.append(True)
+                return me_instance.chat(request.message, history)
+
+            key = f"{me_instance.tenant_id}:{me_instance.cache.key(request.message, history)}"
+            response_text = await inflight.do(key, lead)
+            if not led:
+                record_coalesced(request.message, response_text, start)
+        await remember_turn(me_instance.tenant_id, session_id, history, request.message, response_text)
+        return ChatResponse(response=response_text, session_id=session_id)
+    except HTTPException:
+        raise
     except ValueError as e:
         # Handle missing API key error specifically
         print(f"❌ Configuration error: {e}", flush=True)
@@ -249,6 +345,63 @@ def chat(request: ChatRequest):
         print(f"❌ Error in chat endpoint: {e}", flush=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(data, event=None):
+    """Format a single server-sent event frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {orjson.dumps(data).decode()}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+    release = await admit(http_request, request, reserve=True)
+
+    try:
+        me_instance = await resolve_tenant(request)
+        session_id, history = await resolve_session(request, me_instance.tenant_id)
+    except ValueError as e:
+        release()
+        print(f"❌ Configuration error: {e}", flush=True)
+        raise HTTPException(status_code=500, detail="Server configuration error: OpenAI API key not set. Please contact the administrator.")
+    except BaseException:
+        release()
+        raise
+
+    async def event_stream():
+        try:
+            with metrics.request_trace("chat_stream"):
+                yield sse_event({"session_id": session_id}, event="session")
+                current_session.set(session_id)
+                current_tenant.set(me_instance.tenant_id)
+                start = time.perf_counter()
+                parts = []
+                led = []
+
+                def lead():
+                    led.append(True)
+                    return me_instance.chat_stream(request.message, history)
+
+                key = f"{me_instance.tenant_id}:{me_instance.cache.key(request.message, history)}"
+                deltas = inflight_streams.stream(key, lead)
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+                if not led:
+                    record_coalesced(request.message, "".join(parts), start)
+                await remember_turn(me_instance.tenant_id, session_id, history, request.message, "".join(parts))
+            yield sse_event({}, event="done")
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            print(f"❌ Error in chat stream: {e}", flush=True)
+            yield sse_event({"error": str(e)}, event="error")
+
+    return SlotStreamingResponse(
+        event_stream(),
+        release,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == '__main__':
     import uvicorn
     port = int(os.getenv('PORT', 8000))
@@ -0,0 +1,59 @@
+"""Production server profile: several uvicorn workers under gunicorn.
+
+    gunicorn -c gunicorn.conf.py fastapi_app:app
+
+The app is imported once in the master (preload_app) and the profile corpus,
+retrieval index and system prompt are built there before forking, so every
+worker shares those pages copy-on-write instead of parsing the DOCX again.
+Each worker then warms itself up (tokenizer, OpenAI connection) in its
+startup hook before it accepts connections; /ready reports when that is done.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count() + 1))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-"
+if os.path.isdir("/dev/shm"):
+    # Worker heartbeat files on tmpfs; a slow disk can't make gunicorn kill workers
+    worker_tmp_dir = "/dev/shm"
+
+# The deployment profile runs behind the platform's proxy (Railway, Render, Fly.io), which appends
+# the visitor's address to X-Forwarded-For; without this every visitor shares one rate-limit bucket.
+# Set TRUST_FORWARDED_FOR=0 when the server is reachable directly.
+os.environ.setdefault("TRUST_FORWARDED_FOR", "1")
+
+if workers > 1:
+    # Per-process state would split between workers; share it through SQLite instead
+    os.environ.setdefault("SESSION_STORE", "sqlite")
+    os.environ.setdefault("RATE_LIMIT_STORE", "sqlite")
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded and before any worker is forked"""
+    from chatbot import get_me_instance
+
+    try:
+        get_me_instance()
+    except ValueError as e:
+        server.log.warning(f"Profile not preloaded: {e}")
+    # Move everything allocated so far out of the collector's reach, so garbage
+    # collection in the workers doesn't write to (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Stable slot numbers let a replacement worker pick up its predecessor's notification spool
+    used = {getattr(w, "slot", None) for w in server.WORKERS.values()}
+    worker.slot = next(slot for slot in range(len(used) + 1) if slot not in used)
+
+
+def post_fork(server, worker):
+    os.environ["WORKER_SLOT"] = str(worker.slot)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the chatbot package from backend/, like the servers and bench scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,37 @@
+"""Leads recorded by the contact tool come back from the leads report with every field."""
+import asyncio
+import os
+
+from chatbot.analytics import AnalyticsStore, current_session
+
+
+def test_lead_reads_back_with_name(tmp_path):
+    store = AnalyticsStore(tmp_path / "analytics.db")
+    token = current_session.set("s-1")
+    store.record_event("lead", email="jane@example.com", name="Jane Doe", notes="Hiring for a platform team")
+    current_session.reset(token)
+    store.flush()
+
+    [lead] = store.leads()
+    assert lead["email"] == "jane@example.com"
+    assert lead["name"] == "Jane Doe"
+    assert lead["notes"] == "Hiring for a platform team"
+    assert lead["session"] == "s-1" and lead["tenant"] == "default"
+
+
+def test_contact_tool_records_visitor_name(tmp_path, monkeypatch):
+    from chatbot import engine
+    from chatbot.notifications import NotificationQueue
+
+    async def discard(text):
+        pass
+
+    store = AnalyticsStore(tmp_path / "analytics.db")
+    monkeypatch.setattr(engine, "analytics", store)
+    monkeypatch.setattr(engine, "notifications", NotificationQueue(discard, spool_path=os.devnull))
+
+    asyncio.run(engine.record_user_details("jane@example.com", name="Jane Doe", notes="Asked about the USP team"))
+    store.flush()
+
+    [lead] = store.leads()
+    assert (lead["email"], lead["name"], lead["notes"]) == ("jane@example.com", "Jane Doe", "Asked about the USP team")
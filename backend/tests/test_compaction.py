@@ -0,0 +1,120 @@
+"""HistoryCompactor keeps every prompt under its token budget and reuses its summaries."""
+import asyncio
+import random
+
+from chatbot.compaction import HistoryCompactor, message_tokens
+
+WORDS = "team platform storage video quantum release customer latency kubernetes hiring roadmap".split()
+SYSTEM_PROMPT = "You are answering questions about a professional profile. " * 20
+
+
+class FakeSummarizer:
+    """Stands in for the model: a bounded summary that records what it was asked to fold"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, previous, turns):
+        self.calls.append((previous, turns))
+        return f"{previous} Folded {len(turns)} turns about {turns[0]['content'][:40]}."[-400:]
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def prompt_tokens(messages):
+    return sum(message_tokens(message) for message in messages)
+
+
+def play(compactor, turns, seed):
+    """Run a randomized conversation; returns the token count of every prompt sent"""
+    rng = random.Random(seed)
+    history, sizes = [], []
+
+    async def run():
+        for _ in range(turns):
+            # Mostly short questions, now and then a long paste; answers of varying length
+            message = sentence(rng, 3, 30) if rng.random() < 0.9 else sentence(rng, 300, 600)
+            context = sentence(rng, 20, 80) if rng.random() < 0.5 else None
+            messages = await compactor.build_messages(SYSTEM_PROMPT, list(history), message, context)
+            sizes.append(prompt_tokens(messages))
+            assert messages[0]["content"] == SYSTEM_PROMPT
+            assert messages[-1] == {"role": "user", "content": message}
+            history.extend([{"role": "user", "content": message},
+                            {"role": "assistant", "content": sentence(rng, 10, 200)}])
+
+    asyncio.run(run())
+    return sizes
+
+
+def test_prompt_stays_under_budget():
+    for seed in range(5):
+        summarizer = FakeSummarizer()
+        compactor = HistoryCompactor(summarize=summarizer, max_prompt_tokens=2000, recent_tokens=500,
+                                     fold_threshold_tokens=1000)
+        sizes = play(compactor, turns=80, seed=seed)
+        assert max(sizes) <= compactor.max_prompt_tokens
+        # The conversation outgrew the budget, so compaction actually ran
+        assert summarizer.calls
+
+
+def test_prompt_stays_under_budget_when_summarization_fails():
+    async def failing(previous, turns):
+        raise RuntimeError("upstream down")
+
+    compactor = HistoryCompactor(summarize=failing, max_prompt_tokens=1500, recent_tokens=400,
+                                 fold_threshold_tokens=800)
+    assert max(play(compactor, turns=60, seed=7)) <= compactor.max_prompt_tokens
+    assert compactor.summary_calls == 0
+
+
+def test_summaries_are_reused_across_turns():
+    def summarize_calls(cache_size):
+        summarizer = FakeSummarizer()
+        compactor = HistoryCompactor(summarize=summarizer, max_prompt_tokens=2000, recent_tokens=500,
+                                     fold_threshold_tokens=1000, summary_cache_size=cache_size)
+        play(compactor, turns=80, seed=3)
+        assert compactor.summary_calls == len(summarizer.calls)
+        return summarizer
+
+    summarizer = summarize_calls(1024)
+    # Without the cache nearly every over-budget turn is summarized again from scratch
+    uncached = summarize_calls(0)
+    # A fold happens once the verbatim tail outgrows fold_threshold_tokens, not on every turn
+    assert 0 < len(summarizer.calls) * 2 < len(uncached.calls)
+    # Each call folds only the turns that left the window, on top of the previous summary
+    assert all(previous for previous, _ in summarizer.calls[1:])
+
+
+def test_same_history_does_not_summarize_again():
+    rng = random.Random(11)
+    history = []
+    for _ in range(40):
+        history += [{"role": "user", "content": sentence(rng, 20, 40)},
+                    {"role": "assistant", "content": sentence(rng, 60, 120)}]
+    summarizer = FakeSummarizer()
+    compactor = HistoryCompactor(summarize=summarizer, max_prompt_tokens=1500, recent_tokens=400,
+                                 fold_threshold_tokens=800)
+
+    async def run():
+        first = await compactor.build_messages(SYSTEM_PROMPT, history, "And after that?")
+        calls = len(summarizer.calls)
+        second = await compactor.build_messages(SYSTEM_PROMPT, history, "And after that?")
+        return first, calls, second
+
+    first, calls, second = asyncio.run(run())
+    assert calls == 1
+    assert len(summarizer.calls) == 1
+    assert first == second
+    assert prompt_tokens(first) <= compactor.max_prompt_tokens
+
+
+def test_short_conversation_is_sent_verbatim():
+    summarizer = FakeSummarizer()
+    compactor = HistoryCompactor(summarize=summarizer, max_prompt_tokens=6000)
+    history = [{"role": "user", "content": "Where do you work?"}, {"role": "assistant", "content": "At Quantum."}]
+    messages = asyncio.run(compactor.build_messages(SYSTEM_PROMPT, history, "Since when?"))
+    assert messages == [{"role": "system", "content": SYSTEM_PROMPT}] + history + [
+        {"role": "user", "content": "Since when?"}]
+    assert not summarizer.calls
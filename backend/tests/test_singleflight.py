@@ -0,0 +1,198 @@
+"""Identical concurrent requests share one upstream call, for both /chat and /chat/stream."""
+import asyncio
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from chatbot.replay import StubTransport
+from chatbot.singleflight import SingleFlight, StreamFlight
+
+DELTAS = ["I ", "lead ", "the ", "USP ", "team."]
+
+
+class StubUpstream:
+    """Counts calls; each call waits for `release` so callers can pile up while it is in flight"""
+
+    def __init__(self):
+        self.calls = 0
+        self.completed = 0
+        self.release = asyncio.Event()
+
+    async def complete(self):
+        self.calls += 1
+        await self.release.wait()
+        self.completed += 1
+        return "I lead the USP team."
+
+    async def stream(self):
+        self.calls += 1
+        for delta in DELTAS:
+            await self.release.wait()
+            yield delta
+            await asyncio.sleep(0)
+        self.completed += 1
+
+
+async def settle():
+    """Let every ready task run until it blocks"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_identical_requests_make_one_call():
+    async def run():
+        upstream, flight = StubUpstream(), SingleFlight()
+        callers = [asyncio.ensure_future(flight.do("key", upstream.complete)) for _ in range(20)]
+        await settle()
+        upstream.release.set()
+        return upstream, flight, await asyncio.gather(*callers)
+
+    upstream, flight, results = asyncio.run(run())
+    assert upstream.calls == 1
+    assert results == ["I lead the USP team."] * 20
+    assert flight.stats["leaders"] == 1 and flight.stats["coalesced"] == 19
+    assert not flight.calls
+
+
+def test_different_requests_are_not_coalesced():
+    async def run():
+        upstream, flight = StubUpstream(), SingleFlight()
+        upstream.release.set()
+        await asyncio.gather(*(flight.do(f"key-{i}", upstream.complete) for i in range(5)))
+        return upstream
+
+    assert asyncio.run(run()).calls == 5
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    async def run():
+        upstream, flight = StubUpstream(), SingleFlight()
+        leader = asyncio.ensure_future(flight.do("key", upstream.complete))
+        follower = asyncio.ensure_future(flight.do("key", upstream.complete))
+        await settle()
+        leader.cancel()
+        await settle()
+        upstream.release.set()
+        return upstream, leader, await follower
+
+    upstream, leader, result = asyncio.run(run())
+    assert leader.cancelled()
+    assert result == "I lead the USP team."
+    assert upstream.calls == 1 and upstream.completed == 1
+
+
+def test_every_stream_subscriber_gets_every_delta():
+    async def run():
+        upstream, flight = StubUpstream(), StreamFlight()
+
+        async def subscribe():
+            return [delta async for delta in flight.stream("key", upstream.stream)]
+
+        early = [asyncio.ensure_future(subscribe()) for _ in range(10)]
+        await settle()
+        upstream.release.set()
+        # Joins after the first deltas went out and still gets them from the start
+        while not flight.streams["key"].chunks:
+            await asyncio.sleep(0)
+        late = asyncio.ensure_future(subscribe())
+        return upstream, flight, await asyncio.gather(*early, late)
+
+    upstream, flight, received = asyncio.run(run())
+    assert upstream.calls == 1
+    assert received == [DELTAS] * 11
+    assert flight.stats["coalesced"] == 10
+
+
+def test_disconnecting_subscriber_does_not_cancel_shared_stream():
+    async def run():
+        upstream, flight = StubUpstream(), StreamFlight()
+        upstream.release.set()
+
+        async def leave_after_first():
+            async for _ in flight.stream("key", upstream.stream):
+                raise asyncio.CancelledError  # the client went away
+
+        async def stay():
+            return [delta async for delta in flight.stream("key", upstream.stream)]
+
+        leaver = asyncio.ensure_future(leave_after_first())
+        stayers = [asyncio.ensure_future(stay()) for _ in range(3)]
+        with pytest.raises(asyncio.CancelledError):
+            await leaver
+        return upstream, await asyncio.gather(*stayers)
+
+    upstream, received = asyncio.run(run())
+    assert received == [DELTAS] * 3
+    assert upstream.calls == 1 and upstream.completed == 1
+
+
+def test_stream_error_reaches_every_subscriber():
+    async def failing():
+        yield "partial "
+        raise RuntimeError("upstream failed")
+
+    async def run():
+        flight = StreamFlight()
+
+        async def subscribe():
+            received = []
+            with pytest.raises(RuntimeError):
+                async for delta in flight.stream("key", failing):
+                    received.append(delta)
+            return received
+
+        return await asyncio.gather(*(subscribe() for _ in range(3)))
+
+    assert asyncio.run(run()) == [["partial "]] * 3
+
+
+@pytest.fixture
+def me(monkeypatch, tmp_path):
+    """The real engine with its OpenAI client pointed at a stub transport that counts requests"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    for name, value in {"INTENT_ROUTER": "0", "RESPONSE_CACHE_SIZE": "0", "ANALYTICS": "0",
+                        "PROFILE_WATCH_INTERVAL": "0", "PROFILE_CACHE_PATH": str(tmp_path / "profile.json")}.items():
+        monkeypatch.setenv(name, value)
+    from chatbot import engine
+
+    instance = engine.Me()
+    # Wide enough that every concurrent caller has joined before the response comes back
+    transport = StubTransport(latency=0.2)
+    instance.openai = instance.llm.client = AsyncOpenAI(
+        api_key="test", max_retries=0, http_client=httpx.AsyncClient(transport=transport))
+    return instance, transport
+
+
+def test_concurrent_chats_share_one_openai_request(me):
+    instance, transport = me
+
+    async def run():
+        flight = SingleFlight()
+        replies = await asyncio.gather(*(
+            flight.do("same question", lambda: instance.chat("What is USP?", [])) for _ in range(10)))
+        await instance.openai.close()
+        return replies
+
+    replies = asyncio.run(run())
+    assert transport.requests == 1
+    assert len(set(replies)) == 1 and replies[0]
+
+
+def test_concurrent_streams_share_one_openai_request(me):
+    instance, transport = me
+
+    async def run():
+        flight = StreamFlight()
+
+        async def subscribe():
+            return "".join([delta async for delta in
+                            flight.stream("same question", lambda: instance.chat_stream("What is USP?", []))])
+
+        replies = await asyncio.gather(*(subscribe() for _ in range(10)))
+        await instance.openai.close()
+        return replies
+
+    replies = asyncio.run(run())
+    assert transport.requests == 1
+    assert len(set(replies)) == 1 and replies[0]
@@ -0,0 +1,70 @@
+"""Streaming and non-streaming chats give the same reply when the model calls a tool."""
+import asyncio
+import os
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from chatbot.analytics import AnalyticsStore
+from chatbot.replay import StubTransport
+
+LEAD = "Sounds great, reach me at visitor@example.com"
+
+
+@pytest.fixture
+def me(monkeypatch, tmp_path):
+    """The real engine against the replay stub, which answers an email address with a reply and a
+    record_user_details call in the same response; recorded leads stay in a temporary store"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    for name, value in {"INTENT_ROUTER": "0", "RESPONSE_CACHE_SIZE": "0", "ANALYTICS": "0",
+                        "PROFILE_WATCH_INTERVAL": "0", "PROFILE_CACHE_PATH": str(tmp_path / "profile.json")}.items():
+        monkeypatch.setenv(name, value)
+    from chatbot import engine
+    from chatbot.notifications import NotificationQueue
+
+    async def discard(text):
+        pass
+
+    monkeypatch.setattr(engine, "notifications", NotificationQueue(discard, spool_path=os.devnull))
+    monkeypatch.setattr(engine, "analytics", AnalyticsStore(tmp_path / "analytics.db"))
+    instance = engine.Me()
+    transport = StubTransport()
+    instance.openai = instance.llm.client = AsyncOpenAI(
+        api_key="test", max_retries=0, http_client=httpx.AsyncClient(transport=transport))
+    return instance, transport, engine
+
+
+def converse(instance, engine, message):
+    async def run():
+        reply = await instance.chat(message, [])
+        streamed = "".join([delta async for delta in instance.chat_stream(message, [])])
+        await engine.registry.drain()
+        await instance.openai.close()
+        return reply, streamed
+
+    return asyncio.run(run())
+
+
+def test_single_response_tool_turn_streams_the_same_reply(me):
+    instance, transport, engine = me
+    reply, streamed = converse(instance, engine, LEAD)
+    assert streamed == reply and "visitor@example.com" in reply
+    # One round each: the lead is recorded in the background
+    assert transport.requests == 2
+
+
+def test_extra_round_fallback_streams_only_the_final_reply(me):
+    instance, transport, engine = me
+    instance.single_response_tools = False
+    reply, streamed = converse(instance, engine, LEAD)
+    # The first round's text is replaced by the reply written after the tool result
+    assert streamed == reply and "visitor@example.com" not in reply
+    assert transport.requests == 4
+
+
+def test_plain_turn_streams_the_same_reply(me):
+    instance, transport, engine = me
+    instance.single_response_tools = False
+    reply, streamed = converse(instance, engine, "Where did you study?")
+    assert streamed == reply and reply
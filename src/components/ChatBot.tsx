@@ -10,6 +10,8 @@ export default function ChatBot() {
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
   const [isOpen, setIsOpen] = useState(false);
+  // Conversation history is kept on the server; we only remember which session we're in
+  const sessionIdRef = useRef<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   // Use localhost for development, Railway for production
@@ -28,6 +30,7 @@ export default function ChatBot() {
   };
 
   const API_URL = getApiUrl();
+  const STREAM_URL = `${API_URL}/stream`;
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -43,29 +46,70 @@ export default function ChatBot() {
 
     const userMessage: Message = { role: 'user', content: input };
     const currentInput = input;
-    const currentMessages = messages; // Capture current state before update
     setMessages(prev => [...prev, userMessage]);
     setInput('');
     setLoading(true);
 
     try {
-      const response = await fetch(API_URL, {
+      const response = await fetch(STREAM_URL, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           message: currentInput,
-          // Send history without the current message (matching app.py behavior)
-          history: currentMessages.map(m => ({ role: m.role, content: m.content }))
+          session_id: sessionIdRef.current,
         }),
       });
 
-      const data = await response.json();
-      
-      if (data.error) {
-        throw new Error(data.error);
+      if (!response.ok || !response.body) {
+        throw new Error(`Chat request failed with status ${response.status}`);
       }
 
-      setMessages(prev => [...prev, { role: 'assistant', content: data.response }]);
+      // Read server-sent events and grow the assistant message as tokens arrive
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let started = false;
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let event = 'message';
+          let data = '';
+          for (const line of frame.split('\n')) {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+          }
+          if (!data) continue;
+          const payload = JSON.parse(data);
+
+          if (event === 'error') {
+            throw new Error(payload.error);
+          }
+          if (event === 'session') {
+            sessionIdRef.current = payload.session_id;
+            continue;
+          }
+          if (payload.delta) {
+            if (!started) {
+              started = true;
+              setLoading(false);
+              setMessages(prev => [...prev, { role: 'assistant', content: payload.delta }]);
+            } else {
+              setMessages(prev => {
+                const last = prev[prev.length - 1];
+                return [...prev.slice(0, -1), { ...last, content: last.content + payload.delta }];
+              });
+            }
+          }
+        }
+      }
     } catch (error: any) {
       setMessages(prev => [...prev, {
         role: 'assistant',